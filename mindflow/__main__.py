@@ -1,11 +1,12 @@
 import argparse
-from .core import MindFlow
-from .utils import ROOT_DIR, merge_dicts, load_profile, lazy_import, env_safe_replace
+from .utils import ROOT_DIR, merge_dicts, load_profile, lazy_import, env_safe_replace, profile_dir
+from .utils.startup import Startup
+import importlib
 import asyncio
+import json
+import sys
 import os
 
-from .cli import main as run_cli
-
 from pathlib import Path
 from rich_argparse import RichHelpFormatter
 
@@ -20,7 +21,9 @@ class ArgumentParser(argparse.ArgumentParser):
         
         self.default = default
         self.profile = default
-        Path(ROOT_DIR, ".env").touch()
+        self.startup = None
+        if not Path(ROOT_DIR, ".env").is_file():
+            Path(ROOT_DIR, ".env").touch()
         for title, style in styles.items():
             RichHelpFormatter.styles[title] = style
         
@@ -36,9 +39,11 @@ class ArgumentParser(argparse.ArgumentParser):
         self.add_argument("--switch", metavar='<name>:<version>', type=str, help="Switch to a different profile's custom settings.")
         
         self.add_argument("--default", action="store_true", help="Switch back to default settings.")
+        self.add_argument("--stop", action="store_true", help="Stop the memory server running for the current profile.")
         
         self.add_argument("--api_key", metavar='<api_key>', type=str, help="Set your API KEY for SambaNova API.")
         self.add_argument("--verbose", action="store_true", help="Enable verbose mode for debugging.")
+        self.add_argument("--profile-startup", metavar='<path>', nargs="?", const="-", help="Time each start-up phase, optionally saving the JSON report to <path>.")
 
     def parse(self) -> dict:
         if os.getenv("PROFILE"):
@@ -81,6 +86,20 @@ class ArgumentParser(argparse.ArgumentParser):
     def parse_verbose(self, value):
         self.profile["config"]["verbose"] = True
     
+    def parse_profile_startup(self, value):
+        self.startup = value
+    
+    def parse_stop(self, value):
+        from .memory.server import Manager
+        # the same directory `MindFlow` uses, profiles may keep their memories elsewhere
+        if (path := self.profile.get("paths", {}).get("memories") or profile_dir()) is None:
+            raise FileNotFoundError("No profile has been initialised yet.")
+        
+        if Path(path).is_dir():
+            Manager(path=path).stop()
+        print(f"Stopped memory server for `{os.getenv('PROFILE')}`.")
+        exit()
+    
     def parse_default(self, value):
         self.profile = self.default
     
@@ -125,8 +144,46 @@ class ArgumentParser(argparse.ArgumentParser):
         self.profile = merge_dicts(self.profile, load_profile(path))
         self.profile["env"]["path"] = path
     
+def report(startup: Startup, path: str):
+    # the table is for people (stderr), the JSON stays machine-readable on stdout
+    from rich.console import Console
+    console = Console(stderr=True)
+    console.print(startup.table())
+    
+    if path == "-":
+        sys.stdout.write(json.dumps(startup.report(), indent=2) + "\n")
+        sys.stdout.flush()
+    else:
+        with open(path, "w") as f:
+            json.dump(startup.report(), f, indent=2)
+        console.print(f"Saved start-up report to `{path}`.")
+
+def profiling() -> bool:
+    # only this flag, ahead of the imports it times
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument("--profile-startup", nargs="?", const="-")
+    return parser.parse_known_args()[0].profile_startup is not None
+
+async def profile_warmup(macro, startup: Startup):
+    # one loop for both, the llm session can only be closed on the loop that opened it
+    try:
+        # first recall loads the embedding model, first turn opens the llm connection
+        with startup.phase("warmup"):
+            await macro.warmup()
+    finally:
+        await macro.close()
+
 def main():
+    startup = Startup(enabled=profiling())
     Path(ROOT_DIR, "profiles").mkdir(exist_ok=True) 
+    
+    # heavy third-party packages first, so each one is timed on its own
+    for module in ("chromadb", "aiohttp", "rich", "mindflow.core", "mindflow.cli"):
+        with startup.phase(f"import {module}"):
+            importlib.import_module(module)
+    from .core import MindFlow
+    from .cli import main as run_cli
+    
     from .profile.template import profile
     
     parser = ArgumentParser(
@@ -139,8 +196,15 @@ def main():
         description="[#92c7f5]O[/#92c7f5][#8db9fe]pe[/#8db9fe][#9ca4eb]nm[/#9ca4eb][#bbb2ff]a[/#bbb2ff][#d3aee5]cr[/#d3aee5][#caadea]o[/#caadea] is a multimodal assistant, code interpreter, and human interface for computers. [dim](0.2.8)[/dim]",
         )
     
-    profile = parser.parse()
-    macro = MindFlow(profile)
+    with startup.phase("parse arguments"):
+        profile = parser.parse()
+    macro = MindFlow(profile, startup=startup)
+    
+    if parser.startup:
+        asyncio.run(profile_warmup(macro, startup))
+        report(startup, parser.startup)
+        return
+    
     asyncio.run(run_cli(macro))
 
 if __name__ == "__main__":
@@ -1,9 +1,12 @@
-from rich import print
+from .llm.frames import Hidden, coalesce, END
+
+from rich import print, get_console
 from rich.markdown import Markdown
+from rich.live import Live
 from datetime import datetime
-from .speech import Speech
 
 import threading
+import asyncio
 
 
 def to_chat(lmc: dict, content = True) -> str:
@@ -18,25 +21,124 @@ def to_chat(lmc: dict, content = True) -> str:
         return (display, _content)
     return display
 
+class Renderer:
+    """
+    Streams the assistant's reply into the terminal as markdown.
+    Finished blocks (up to a blank line outside a code fence) are printed once,
+    only the block still being written stays in a live region, re-rendered at most `fps` times a second.
+    Pipes and files (or mode "raw") get the plain text, written as it arrives.
+    """
+    def __init__(self, mode: str = "live", fps: int = 12, console=None):
+        self.console = console or get_console()
+        self.live = mode == "live" and self.console.is_terminal
+        self.fps = fps
+        self.region = None
+        self.text = ""
+    
+    def feed(self, chunk: str):
+        if not self.live:
+            self.console.file.write(chunk)
+            self.console.file.flush()
+            return
+        
+        if self.region is None:
+            self.region = Live(console=self.console, 
+                               refresh_per_second=self.fps, 
+                               vertical_overflow="visible")
+            self.region.start()
+        
+        self.text += chunk
+        if (block := self.split()):
+            self.region.console.print(Markdown(block))
+        # drawn by the region's own refresh, not on every chunk
+        self.region.update(Markdown(self.text))
+    
+    def split(self) -> str:
+        # everything before the last blank line that isn't inside a code fence
+        cut = self.text.rfind("\n\n")
+        while cut != -1 and self.text.count("```", 0, cut) % 2:
+            cut = self.text.rfind("\n\n", 0, cut)
+        if cut == -1:
+            return ""
+        block, self.text = self.text[:cut], self.text[cut + 2:]
+        return block.strip("\n")
+    
+    def stop(self):
+        if self.region is not None:
+            self.region.update(Markdown(self.text), refresh=True)
+            self.region.stop()
+        self.region, self.text = None, ""
+
+async def prompt(text: str) -> str:
+    # read on a daemon thread, a thread of the loop's executor would still be
+    # blocked in `input()` when Ctrl-C shuts the loop down, and exit would hang on it
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def settle(method, value):
+        if not future.done():
+            method(value)
+    
+    def read():
+        try:
+            line = input(text)
+        except BaseException as e:
+            loop.call_soon_threadsafe(settle, future.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(settle, future.set_result, line)
+    
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
 async def main(macro):
     split = False
-    hidden = False
+    # in verbose mode hidden text reaches the cli, it is shown but never spoken
+    hidden = Hidden()
     
     if macro.profile["tts"]["enabled"]:
+        from .speech import Speech
         speech = Speech(tts=macro.profile["tts"])
+    
+    renderer = Renderer(macro.profile["config"].get("render", "live"))
         
     while True:
         user = to_chat({"role": macro.profile["user"]["name"]}, content=False)
         print(user)
+        # warm up recall and the llm connection while the user is typing
+        warmup = asyncio.ensure_future(macro.warmup())
         try:
-            query = input('~ ') or "plot an exponential graph"
-        except Exception as e:
+            query = await prompt('~ ') or "plot an exponential graph"
+            await warmup
+        except (Exception, KeyboardInterrupt, asyncio.CancelledError):
+            # Ctrl-C cancels this task, EOF (Ctrl-D) raises
+            warmup.cancel()
             print("Exiting `mindflow`...")
+            await macro.close()
             exit()
         
         assistant = to_chat({"role": macro.name}, content=False)
         print("\n" + assistant)
-        async for chunk in macro.chat(query, stream=True):
+        streaming = False
+        # one print per screen refresh at most, however fast tokens arrive
+        async for chunk in coalesce(macro.chat(query, stream=True), interval=1 / 30):
+            if isinstance(chunk, dict):
+                # anything else printed goes below the reply so far
+                renderer.stop()
+            
+            # live output of running code
+            if isinstance(chunk, dict) and chunk.get("type") == "stream":
+                if not streaming:
+                    print("\n")
+                    print(to_chat(chunk, content=False))
+                    streaming = True
+                print(chunk.get("content", ""), end="")
+                continue
+            
+            if streaming:
+                streaming = False
+                assistant = to_chat({"role": macro.name}, content=False)
+                print("\n" + assistant)
+                
             if isinstance(chunk, dict):        
                 print("\n")
                 computer, content = to_chat(chunk)
@@ -49,15 +151,14 @@ async def main(macro):
         
 
             elif macro.profile["tts"]["enabled"]:
-                if "<hidden>" in chunk:
-                    hidden = True
-                elif "</hidden>" in chunk:
-                    hidden = False
-                    
-                if not hidden and not "</hidden>" in chunk:
-                    speech.tts.stream(chunk)
+                if chunk == END:
+                    speech.tts.stream("".join(text for secret, text in hidden.close() if not secret))
+                    speech.tts.stream(END)
+                elif (text := hidden.visible(chunk)):
+                    speech.tts.stream(text)
                     
-            if isinstance(chunk, str) and not (chunk == "<end>"):
-                print(chunk, end="")
+            if isinstance(chunk, str) and not (chunk == END):
+                renderer.feed(chunk)
             
+        renderer.stop()
         print("\n")
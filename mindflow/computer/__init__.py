@@ -1,21 +1,76 @@
 import shutil
+import hashlib
+import asyncio
+import json
+import os
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 from functools import partial
 from pathlib import Path
 from ..utils import ROOT_DIR
+from ..utils.metrics import metrics
+from .kernel import kernel
+from .output import Output
+from .limits import Watchdog, resolve, popen_kwargs, address_space, heap, verdict
 import mindflow.extensions as extensions
 
 class Computer:
     def __init__(self, 
                  profile_path: Path | str = None,
                  paths: Dict[str, list] = None,
-                 extensions: Dict[str, object] = None):
+                 extensions: Dict[str, object] = None,
+                 kernels: bool = True,
+                 parallel: int = 4,
+                 limit: int = 8000,
+                 limits: dict = None,
+                 cache: Path | str = None):
         
         self.profile_path = profile_path or Path(ROOT_DIR, "profile", "template.py")
         self.extensions = extensions or {}
         self.custom_paths = paths or {}
+        self.cache = cache
         self.supported = self.available()
+        self.limit = limit
+        self.limits = limits or {}
+        
+        # independent notebooks run side by side
+        self.executor = ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="computer")
+        
+        # warm interpreters, started lazily on first run
+        self.kernels = {}
+        if kernels:
+            for language, command in self.supported.items():
+                limit = resolve(self.limits, language)
+                # a kernel that can't apply a per-run cpu limit isn't used when one is set,
+                # those notebooks run one process each so the limit holds
+                if (warm := kernel(language, command, limit["memory"])) and (warm.cpu or not limit["cpu"]):
+                    self.kernels[language] = warm
+        # last execution per kernel, runs against shared state go in order
+        self.last = {}
+        
+    def stateful(self) -> list[str]:
+        return list(self.kernels)
+    
+    def close(self):
+        for warm in self.kernels.values():
+            warm.close()
+        self.executor.shutdown(wait=False)
+        
+    async def run_async(self, code: str, language: str = 'python') -> str:
+        return await self.execution(code, language)
+    
+    def run_many(self, notebooks: Dict[str, str]) -> List["Execution"]:
+        # dispatched together, awaited in order by the caller
+        return [self.execution(code, language)
+                for language, code in notebooks.items()]
+    
+    def execution(self, code: str, language: str) -> "Execution":
+        # a kernel's runs are chained, a later notebook never overtakes an earlier one
+        if language not in self.kernels:
+            return Execution(self, code, language)
+        self.last[language] = Execution(self, code, language, after=self.last.get(language))
+        return self.last[language]
         
     def inject_kwargs(self, code):
         for extension, vals in self.extensions.items():
@@ -26,7 +81,7 @@ class Computer:
     
     def load_instructions(self):
         return "\n\n".join(
-            getattr(extensions, extension).load_instructions()
+            extensions.load_instructions(extension)
             for extension in self.extensions.keys()
         )
 
@@ -53,20 +108,93 @@ class Computer:
             "java": "-e"
         }
         
-        supported = {}
-        for lang, command in languages.items():
-            if (path := self.check(command)):
-                supported[lang] = [path, args[lang]]
+        # walking PATH for every candidate is slow, reuse the last
+        # discovery until PATH or one of its directories changes
+        if (supported := self.load_toolchain()) is None:
+            supported = {}
+            for lang, command in languages.items():
+                if (path := self.check(command)):
+                    supported[lang] = [path, args[lang]]
+            self.save_toolchain(supported)
         supported |= self.custom_paths
         
         return supported
     
+    @staticmethod
+    def fingerprint() -> dict:
+        path = os.environ.get("PATH", "")
+        mtimes = {}
+        for directory in path.split(os.pathsep):
+            try: mtimes[directory] = os.stat(directory).st_mtime
+            except OSError: continue
+        return {"path": hashlib.sha1(path.encode()).hexdigest(), "mtimes": mtimes}
+    
+    def load_toolchain(self) -> dict | None:
+        if self.cache is None or not Path(self.cache).is_file():
+            return None
+        
+        try:
+            with open(self.cache, "r") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if cached.get("fingerprint") != self.fingerprint():
+            return None
+        if not all(os.path.isfile(command[0]) for command in cached.get("supported", {}).values()):
+            return None
+        return cached["supported"]
+    
+    def save_toolchain(self, supported: dict):
+        if self.cache is None:
+            return
+        
+        try:
+            with open(self.cache, "w") as f:
+                json.dump({"fingerprint": self.fingerprint(), "supported": supported}, f)
+        except OSError:
+            pass
+    
     def check(self, exes) -> bool:
         for exe in exes:
             if (exe := shutil.which(exe)):
                 return exe
     
-    def run(self, code: str, language: str ='python') -> str:
+    def execute(self, command: list[str], language: str, write, watchdog: Watchdog, limits: dict) -> int:
+        process = subprocess.Popen(heap(command, language, limits["memory"]), 
+                                   stdout=subprocess.PIPE, 
+                                   stderr=subprocess.STDOUT, 
+                                   text=True,
+                                   errors="replace",
+                                   **popen_kwargs(memory=address_space(language, limits["memory"]), 
+                                                  cpu=limits["cpu"]))
+        watchdog.watch(process)
+        for line in iter(process.stdout.readline, ""):
+            write(line)
+        return process.wait()
+    
+    @staticmethod
+    def killed(reason: str, limits: dict) -> str:
+        # structured, so the model can tell a kill from a normal failure
+        limit = {"timeout": f"{limits['time']}s wall-clock limit",
+                 "cpu": f"{limits['cpu']}s cpu limit",
+                 "oom": f"{limits['memory']}MB memory limit" if limits["memory"] else "available memory"}[reason]
+        return f"killed: {reason} (exceeded the {limit})"
+    
+    def result(self, text: str, returncode: int, killed: str | None, limits: dict) -> str:
+        if killed:
+            return (text + "\n\n" + self.killed(killed, limits)).strip()
+        if text:
+            return text
+        if returncode == 0:
+            return (f"The following code did not generate any console text output, but may generate other output.")
+        return (f"Command executed with exit code: {returncode}")
+    
+    def run(self, code: str, language: str ='python', on_output=None) -> str:
+        with metrics.span("execute", language=language) as span:
+            return self._run(code, language, on_output, span)
+    
+    def _run(self, code: str, language: str, on_output, span) -> str:
         try:
             command = self.supported.get(language, None)
             if command is None: 
@@ -75,12 +203,60 @@ class Computer:
             if language == "python":
                 code = self.inject_kwargs(code)
 
-            result = subprocess.run(command + [code], capture_output=True, text=True)
-            if result.stdout or result.stderr:
-                return (result.stdout + "\n" + result.stderr).strip()
-            if result.returncode == 0:
-                return (f"The following code did not generate any console text output, but may generate other output.")
-            return (f"Command executed with exit code: {result.returncode}")
+            # streamed to `on_output` while running, capped for the model
+            output = Output(self.limit, on_output)
+            limits = resolve(self.limits, language)
+            watchdog = Watchdog(limits["time"])
+            try:
+                if language in self.kernels:
+                    returncode = self.kernels[language].run(code, output.write, watchdog, limits["cpu"])
+                else:
+                    returncode = self.execute(command + [code], language, output.write, watchdog, limits)
+            finally:
+                watchdog.cancel()
+            output.close()
+            
+            text = output.text().strip()
+            span.set(returncode=returncode, characters=output.total)
+            if (killed := verdict(returncode, text, watchdog, limits["memory"])):
+                span.set(killed=killed)
+            result = self.result(text, returncode, killed, limits)
+            
+            if language in self.kernels and not self.kernels[language].alive():
+                # the next run starts a fresh interpreter, the model has to know
+                span.set(reset=True)
+                result += (f"\n\nNOTE: the {language} kernel exited, variables, imports and functions "
+                           "from previous runs are gone. Send all the code needed again.")
+            return result
             
         except Exception as e:
             return f"An error occurred: {e}"
+
+class Execution:
+    """
+    A notebook running on the computer's pool.
+    Await it for the final output, or stream its output while it runs.
+    """
+    def __init__(self, computer: Computer, code: str, language: str, after: "Execution" = None):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.future = asyncio.ensure_future(self.run(computer, code, language, after))
+        self.future.add_done_callback(lambda _: self.queue.put_nowait(None))
+    
+    async def run(self, computer: Computer, code: str, language: str, after: "Execution" = None) -> str:
+        if after is not None:
+            # whatever its outcome
+            await asyncio.wait({after.future})
+        return await self.loop.run_in_executor(computer.executor, 
+                                               partial(computer.run, code, language, on_output=self.put))
+        
+    def put(self, text: str):
+        # called from the pool's threads
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, text)
+        
+    async def stream(self):
+        while (text := await self.queue.get()) is not None:
+            yield text
+            
+    def __await__(self):
+        return self.future.__await__()
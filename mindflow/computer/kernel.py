@@ -0,0 +1,183 @@
+import subprocess
+import threading
+import tempfile
+import shlex
+import json
+import os
+from pathlib import Path
+from .limits import Watchdog, popen_kwargs, kill
+
+# prefixes the kernel's reply, anything printed before it is stray output
+MARKER = "\x00mindflow:"
+
+PYTHON = r'''
+import sys, io, os, json, traceback
+try:
+    import resource
+except ImportError:
+    resource = None
+stdin, stdout = sys.stdin, sys.stdout
+sys.stdin = open(os.devnull)
+
+class Stream(io.TextIOBase):
+    # forwards output line by line while the notebook runs
+    def __init__(self):
+        self.buffer = ""
+    def writable(self):
+        return True
+    def write(self, text):
+        self.buffer += text
+        if "\n" in self.buffer:
+            lines, self.buffer = self.buffer.rsplit("\n", 1)
+            self.send(lines + "\n")
+        return len(text)
+    def flush(self):
+        if self.buffer:
+            self.send(self.buffer)
+            self.buffer = ""
+    def send(self, text):
+        stdout.write(MARKER + json.dumps(["output", text]) + "\n")
+        stdout.flush()
+
+sys.stdout = sys.stderr = Stream()
+scope = {"__name__": "__main__", "__builtins__": __builtins__}
+for request in stdin:
+    request, cpu, code = *json.loads(request), 0
+    if resource and cpu:
+        # cpu seconds for this run only, the kernel itself lives on
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+        resource.setrlimit(resource.RLIMIT_CPU, (int(usage.ru_utime + usage.ru_stime) + cpu, hard))
+    try:
+        exec(compile(request, "<notebook>", "exec"), scope)
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 0
+    except BaseException:
+        kind, value, trace = sys.exc_info()
+        traceback.print_exception(kind, value, trace.tb_next)
+        code = 1
+    sys.stdout.flush()
+    stdout.write(MARKER + json.dumps(["done", code]) + "\n")
+    stdout.flush()
+'''.replace("MARKER", repr(MARKER))
+
+class Kernel:
+    """
+    A long-lived interpreter that keeps its state between runs.
+    Only the new code is sent, so interpreter start-up and imports are paid once.
+    """
+    # applies a cpu limit to each run
+    cpu = True
+
+    def __init__(self, command: list[str], memory: int = None):
+        self.command = command
+        self.memory = memory
+        self.process = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.process = subprocess.Popen(self.command,
+                                        **popen_kwargs(memory=self.memory),
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT,
+                                        text=True,
+                                        encoding="utf-8",
+                                        errors="replace",
+                                        bufsize=1)
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def run(self, code: str, write, watchdog: Watchdog = None, cpu: int = None) -> int:
+        # output is passed to `write` as it arrives, returns the exit code
+        with self.lock:
+            if not self.alive():
+                self.start()
+            if watchdog:
+                watchdog.watch(self.process)
+            self.send(code, cpu)
+            return self.receive(write)
+
+    def send(self, code: str, cpu: int = None):
+        self.process.stdin.write(json.dumps([code, cpu]) + "\n")
+        self.process.stdin.flush()
+
+    def receive(self, write) -> int:
+        for line in iter(self.process.stdout.readline, ""):
+            # stray output (e.g. from child processes) may lack a trailing newline,
+            # so the reply can be glued onto the end of it
+            stray, marker, reply = line.partition(MARKER)
+            if stray:
+                write(stray)
+            if not marker:
+                continue
+
+            kind, value = json.loads(reply)
+            if kind == "done":
+                return value
+            write(value)
+
+        # the interpreter exited (e.g. `os._exit()`), state is lost
+        # and a fresh kernel is started on the next run
+        return self.process.wait()
+
+    def close(self):
+        if self.alive():
+            kill(self.process)
+            self.process.wait()
+
+class ShellKernel(Kernel):
+    # the shell itself reads commands from stdin, so `cd` and variables persist
+    # (no per-run cpu limit, `ulimit` would apply to the whole shell)
+    cpu = False
+
+    def __init__(self, command: list[str], memory: int = None):
+        super().__init__(command, memory)
+        self.script = None
+
+    def send(self, code: str, cpu: int = None):
+        # the code is sourced from a file, an unterminated quote or heredoc
+        # then ends with the file instead of swallowing the marker
+        if self.script is None:
+            descriptor, self.script = tempfile.mkstemp(prefix="mindflow-", suffix=".sh")
+            os.close(descriptor)
+        Path(self.script).write_text(code + "\n", encoding="utf-8")
+        self.process.stdin.write(f". {shlex.quote(self.script)} < /dev/null 2>&1\n" +
+                                 f"printf '\\n{MARKER}%s\\n' \"$?\"\n".replace("\x00", "\\000"))
+        self.process.stdin.flush()
+
+    def receive(self, write) -> int:
+        previous = None
+        for line in iter(self.process.stdout.readline, ""):
+            if line.startswith(MARKER):
+                # drop the newline printed ahead of the marker
+                if previous is not None and previous != "\n":
+                    write(previous[:-1])
+                return int(line[len(MARKER):])
+
+            # held back by one line, the last one carries the extra newline
+            if previous is not None:
+                write(previous)
+            previous = line
+
+        if previous is not None:
+            write(previous)
+        return self.process.wait()
+
+    def close(self):
+        super().close()
+        if self.script is not None:
+            Path(self.script).unlink(missing_ok=True)
+            self.script = None
+
+def kernel(language: str, command: list[str], memory: int = None) -> Kernel | None:
+    # only interpreters with a known driver get a kernel,
+    # everything else keeps running one process per notebook
+    executable, flag = command[0], command[-1]
+    name = Path(executable).stem.lower()
+
+    if language == "python" and flag == "-c":
+        return Kernel(command[:-1] + ["-u", "-c", PYTHON], memory)
+    if language == "bash" and flag == "-c" and name == "bash" and os.name != "nt":
+        return ShellKernel(command[:-1] + ["--noprofile", "--norc"], memory)
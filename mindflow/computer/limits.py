@@ -0,0 +1,98 @@
+import subprocess
+import threading
+import signal
+import os
+from pathlib import Path
+
+try:
+    import resource
+except ImportError: # windows
+    resource = None
+
+KEYS = ("time", "cpu", "memory")
+OOM = ("MemoryError", "out of memory", "Fatal process OOM", "std::bad_alloc", "Cannot allocate memory")
+
+# runtimes that reserve far more address space than they use,
+# RLIMIT_AS stops them from starting at all
+VIRTUAL = {"js"}
+
+def resolve(limits: dict, language: str) -> dict:
+    # top-level values are defaults, nested dicts override them per language
+    limits = limits or {}
+    return {key: limits.get(language, {}).get(key, limits.get(key)) for key in KEYS}
+
+def address_space(language: str, memory: int = None) -> int | None:
+    return None if language in VIRTUAL else memory
+
+def heap(command: list[str], language: str, memory: int = None) -> list[str]:
+    # v8 caps its own heap instead of the address space, see `VIRTUAL`
+    if language == "js" and memory and Path(command[0]).stem.lower() == "node":
+        return command[:1] + [f"--max-old-space-size={int(memory)}"] + command[1:]
+    return command
+
+def popen_kwargs(memory: int = None, cpu: int = None) -> dict:
+    # own process group, so the whole tree can be killed
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+
+    kwargs = {"start_new_session": True}
+    if not resource or not (memory or cpu):
+        # `preexec_fn` isn't safe from the pool's threads and rules out posix_spawn,
+        # so it's only used when there is a limit to set
+        return kwargs
+
+    def preexec():
+        if memory:
+            size = int(memory) * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (size, size))
+        if cpu:
+            resource.setrlimit(resource.RLIMIT_CPU, (int(cpu), int(cpu) + 1))
+
+    return kwargs | {"preexec_fn": preexec}
+
+def kill(process: subprocess.Popen):
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == "nt":
+            process.kill()
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+class Watchdog:
+    # kills a process (and its children) once the wall-clock limit is hit
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout
+        self.fired = False
+        self.timer = None
+
+    def watch(self, process: subprocess.Popen):
+        if not self.timeout:
+            return
+        self.timer = threading.Timer(self.timeout, self.fire, [process])
+        self.timer.daemon = True
+        self.timer.start()
+
+    def fire(self, process: subprocess.Popen):
+        self.fired = True
+        kill(process)
+
+    def cancel(self):
+        if self.timer:
+            self.timer.cancel()
+
+def verdict(returncode: int, output: str, watchdog: Watchdog, memory: int = None) -> str | None:
+    if watchdog.fired:
+        return "timeout"
+
+    xcpu = getattr(signal, "SIGXCPU", None)
+    if xcpu and returncode in (-xcpu, 128 + xcpu):
+        return "cpu"
+
+    # a bare SIGKILL is only blamed on memory when there was a limit to hit,
+    # otherwise it's a `kill -9` or similar
+    killed = memory and returncode in (-9, 137)
+    if returncode and (killed or any(marker in output[-2000:] for marker in OOM)):
+        return "oom"
@@ -0,0 +1,47 @@
+from collections import deque
+
+class Output:
+    """
+    Bounded capture of a notebook's output.
+    Keeps the head and the tail, whatever is in between is dropped,
+    so huge outputs never make it into the conversation.
+    """
+    def __init__(self, limit: int = 8000, on_output=None):
+        self.limit = limit
+        self.on_output = on_output
+        self.head = ""
+        self.tail = deque()
+        self.tail_size = 0
+        self.total = 0
+
+    def write(self, text: str):
+        self.total += len(text)
+
+        # streamed live until the head is full
+        if (room := self.limit // 2 - len(self.head)) > 0:
+            piece, text = text[:room], text[room:]
+            self.head += piece
+            if self.on_output and piece:
+                self.on_output(piece)
+
+        if text:
+            if self.on_output and not self.tail:
+                self.on_output("\n... output truncated ...\n")
+            self.tail.append(text)
+            self.tail_size += len(text)
+            while self.tail and self.tail_size - len(self.tail[0]) >= self.limit // 2:
+                self.tail_size -= len(self.tail.popleft())
+
+    def close(self):
+        # the tail is only shown once the notebook is done
+        if self.on_output and self.tail:
+            self.on_output(self.text_tail())
+
+    def text_tail(self) -> str:
+        return "".join(self.tail)[-(self.limit // 2):]
+
+    def text(self) -> str:
+        tail = self.text_tail()
+        if (dropped := self.total - len(self.head) - len(tail)) > 0:
+            return self.head + f"\n\n... [{dropped} characters truncated] ...\n\n" + tail
+        return self.head + tail
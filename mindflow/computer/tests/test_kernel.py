@@ -0,0 +1,35 @@
+import shutil
+import sys
+
+import pytest
+
+from mindflow.computer.kernel import kernel
+
+
+def run(k, code: str) -> tuple[int, str]:
+    output = []
+    return k.run(code, output.append), "".join(output)
+
+
+def test_unterminated_output_before_reply():
+    # a child's output without a trailing newline is followed directly by the reply
+    k = kernel("python", [sys.executable, "-c"])
+    try:
+        code, output = run(k, "import os; os.system('printf hi')")
+        assert (code, output) == (0, "hi")
+        assert run(k, "print(1 + 1)") == (0, "2\n")
+    finally:
+        k.close()
+
+
+@pytest.mark.skipif(not shutil.which("bash"), reason="no bash")
+def test_unterminated_shell_code():
+    k = kernel("bash", [shutil.which("bash"), "-c"])
+    try:
+        assert run(k, "x=1; cd /") == (0, "")
+        code, _ = run(k, "echo 'unterminated")
+        assert code != 0
+        code, _ = run(k, "cat <<EOF\nno end")
+        assert run(k, 'echo "$x $PWD"') == (0, "1 /\n")
+    finally:
+        k.close()
@@ -2,20 +2,24 @@ from ..computer import Computer
 from ..profile import Profile
 from ..profile.template import profile as default_profile
 
-from ..llm import LLM, to_lmc, to_chat, interpret_input
-from ..utils import ROOT_DIR, OS, generate_id, get_relevant, load_profile, load_prompts, init_profile
+from ..llm import LLM, Context, StreamParser, Hidden, coalesce, END, to_lmc, to_chat
+from ..utils import ROOT_DIR, OS, generate_id, get_relevant, load_profile, load_prompts, load_env, init_profile
+from ..utils.snapshot import Snapshot
+from ..utils.startup import Startup
+from ..utils.metrics import metrics
+from ..utils.cassette import Cassette
 
 from ..memory.server import Manager
-from ..memory.client import Memory
-from chromadb.config import Settings
+from ..memory.worker import MemoryWorker
+from ..memory.policy import MemorisePolicy
+from ..memory.cache import RecallCache
 
 from datetime import datetime
 from pathlib import Path
-import threading
 import asyncio
+import atexit
 import json
-
-from dotenv import load_dotenv
+import os
 
 class MindFlow:
     """
@@ -39,7 +43,11 @@ class MindFlow:
             dev = False,
             llm = None,
             extensions: dict = {},
-            breakers = ("the task is done.", "the conversation is done.")) -> None:
+            breakers = ("the task is done.", "the conversation is done."),
+            startup: Startup = None) -> None:
+        
+        # phases are only timed for `macro --profile-startup`
+        self.startup = startup = startup or Startup()
         
         profile = profile or load_profile(profile_path) or default_profile
         self.profile = profile
@@ -49,16 +57,28 @@ class MindFlow:
         self.prompts_dir = prompts_dir or paths.get("prompts")
         self.memories_dir = memories_dir or paths.get("memories") or Path(ROOT_DIR, "profiles", profile["user"]["name"], profile["user"]["version"])
         
-        load_dotenv()
-        load_dotenv(dotenv_path=Path(self.memories_dir.parent, ".env"))
+        # compiled prompts, rebuilt only when their sources change
+        self.snapshot = Snapshot(Path(self.memories_dir, "snapshot.json"))
+        
+        with startup.phase("load .env"):
+            for key, value in load_env(Path(ROOT_DIR, ".env"), Path(self.memories_dir.parent, ".env")).items():
+                os.environ.setdefault(key, value)
         
-        init_profile(self.profile, 
-                     self.memories_dir)
+        with startup.phase("init_profile"):
+            init_profile(self.profile, 
+                         self.memories_dir)
         
         # setup other instances
-        self.computer = computer or Computer(profile_path=profile.get("path", None),
-                                             paths=profile.get("languages", {}),
-                                             extensions=extensions or profile.get("extensions", {}))
+        with startup.phase("computer"):
+            self.computer = computer or Computer(profile_path=profile.get("path", None),
+                                                 paths=profile.get("languages", {}),
+                                                 extensions=extensions or profile.get("extensions", {}),
+                                                 kernels=profile["config"].get("kernels", True),
+                                                 parallel=profile["config"].get("parallel", 4),
+                                                 limit=profile["safeguards"].get("output_limit", 8000),
+                                                 limits=profile["safeguards"].get("limits"),
+                                                 cache=Path(self.memories_dir, "toolchain.json"))
+        atexit.register(self.computer.close)
     
         # logging + debugging
         self.verbose = verbose or profile["config"]["verbose"]
@@ -74,6 +94,8 @@ class MindFlow:
         self.dev = dev or profile["config"]["dev"]
         
         # setup setup variables
+        with startup.phase("extension instructions"):
+            instructions = extensions or self.computer.load_instructions()
         self.info = {
             "assistant": profile['assistant']['name'],
             "personality": profile['assistant']['personality'],
@@ -81,156 +103,326 @@ class MindFlow:
             "version": profile["user"]["version"],
             "os": OS,
             "supported": list(self.computer.supported),
-            "extensions": extensions or self.computer.load_instructions()
+            "notebook": self.notebook_note(),
+            "extensions": instructions
         }
         
         # setup memory
-        self.memory_manager = Manager(path=self.memories_dir, telemetry=telemetry)
-        self.memory_manager.serve_and_wait()
+        memory = profile.get("memory", {})
+        self.memory_manager = Manager(path=self.memories_dir, 
+                                      telemetry=telemetry,
+                                      embedded=memory.get("embedded", False),
+                                      port=memory.get("port"),
+                                      timeout=memory.get("timeout", 30))
+        with startup.phase("memory server"):
+            self.memory_manager.serve_and_wait()
         
-        self.memory = Memory(host='localhost', 
-                             port=8000,
-                             settings=Settings(anonymized_telemetry=telemetry))
-        self.ltm = self.memory.get_or_create_collection("ltm")
-        
-        # restart stm cache
-        # self.memory.delete_collection(name="cache")
-        self.cache = self.memory.get_or_create_collection("cache")
+        # async collections are opened per loop on first use, see `collections`
+        self.async_collections = {}
+        self._ltm = None
         
         # experimental (not yet implemented)
         self.local = local or profile["config"]["local"]
 
         # setup prompts
-        self.prompts = load_prompts(self.prompts_dir, 
-                                    self.info, 
-                                    self.conversational)
+        with startup.phase("load_prompts"):
+            self.prompts = self.snapshot.compile("prompts",
+                                                 (Path(self.prompts_dir), self.info, self.conversational),
+                                                 lambda: load_prompts(self.prompts_dir, 
+                                                                      self.info, 
+                                                                      self.conversational))
+            self.snapshot.save()
             
         # setup llm
         self.name = profile['assistant']["name"]
-        self.llm = llm or LLM(messages=messages, 
-                              verbose=verbose, 
-                              system=self.prompts['initial']) 
+        # granularity of the llm stream inside a turn, see `llm.coalesce`
+        self.frames = profile["config"].get("frames", {})
+        # latency spans, see `utils.metrics`
+        metrics.configure(path=profile["config"].get("metrics"),
+                          verbose=self.verbose)
+        
+        # recorded llm and browser traffic, exported so kernels replay it too
+        self.cassette = None
+        if (cassette := profile["config"].get("cassette")):
+            self.cassette = Cassette(**cassette)
+            self.cassette.export()
+        
+        with startup.phase("llm"):
+            self.llm = llm or LLM(messages=messages, 
+                                  verbose=verbose, 
+                                  system=self.prompts['initial'],
+                                  cassette=self.cassette,
+                                  context=Context(**profile["config"].get("context", {}))) 
+        
+        # recall
+        self.generation = 0
+        self.recall_cache = RecallCache(size=memory.get("recall_cache", 64),
+                                        ttl=memory.get("recall_ttl", 300))
+        self.recall_deadline = memory.get("recall_deadline")
+        self.warm = False
+        
+        self.memorise_policy = MemorisePolicy(turns=memory.get("turns", 3),
+                                              window=memory.get("window", 12))
+        self.memoriser = MemoryWorker(memorise=self.memorise,
+                                      write=self.write_memories,
+                                      size=memory.get("queue", 32),
+                                      batch=memory.get("batch", 8),
+                                      cleanup=self.llm.close)
+        self.memoriser_timeout = memory.get("close_timeout", 10)
+        atexit.register(self.flush_memories)
         
         self.loop = asyncio.get_event_loop()
         
-    async def remember(self, message):
-        document = self.ltm.query(query_texts=[message],
-                                    n_results=3,
-                                    include=["documents", "metadatas", "distances"])
+    def notebook_note(self) -> str:
+        if not (stateful := self.computer.stateful()):
+            return "**NOTE, EVERY TIME CODE IS RAN, THE SCRIPT/ NOTEBOOK IS CLEARED.**"
+        return (f"**NOTE, VARIABLES, IMPORTS AND FUNCTIONS ARE KEPT BETWEEN RUNS FOR: {', '.join(stateful)}. "
+                "ONLY SEND NEW CODE, DO NOT REPEAT PREVIOUS CODE. OTHER LANGUAGES ARE CLEARED EVERY TIME CODE IS RAN.**")
+    
+    async def warmup(self):
+        # one-off costs (embedding model, llm connection) paid while the user is typing
+        tasks = [self.llm.warmup()]
+        if not self.warm:
+            self.warm = True
+            ltm = (await self.collections())["ltm"]
+            tasks.append(ltm.query(query_texts=["warmup"], n_results=1))
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def collections(self) -> dict:
+        # async clients are bound to the loop they were created on
+        loop = asyncio.get_running_loop()
+        if loop not in self.async_collections:
+            self.async_collections[loop] = asyncio.ensure_future(self.connect_collections())
+        return await self.async_collections[loop]
+    
+    async def connect_collections(self) -> dict:
+        client = await self.memory_manager.connect_async()
+        return {name: await client.get_or_create_collection(name)
+                for name in ("ltm", "cache")}
+    
+    async def recall(self, message) -> dict:
+        # same query against an unchanged ltm gives the same snapshot
+        generation = self.generation
+        with metrics.span("recall") as span:
+            snapshot = self.recall_cache.get(message, generation)
+            span.set(cached=snapshot is not None)
+            if snapshot is None:
+                snapshot = await self.query_ltm(message)
+                self.recall_cache.put(message, generation, snapshot)
+        return snapshot
+    
+    async def query_ltm(self, message) -> dict:
+        ltm = (await self.collections())["ltm"]
+        document = await ltm.query(query_texts=[message],
+                                   n_results=3,
+                                   include=["documents", "metadatas", "distances"])
         
         # filter by distance
-        snapshot = get_relevant(document, threshold=1.45)
+        return get_relevant(document, threshold=1.45)
+    
+    async def speculative_remember(self, message):
+        # recall overlaps with opening the llm connection,
+        # past the deadline the turn goes ahead without memories
+        recall = asyncio.ensure_future(self.recall(message))
+        warmup = asyncio.ensure_future(self.llm.warmup())
+        for task in (recall, warmup):
+            # late or failed tasks are never awaited, their errors are retrieved here
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        
+        with metrics.span("remember") as span:
+            # the turn only waits for recall, the connection keeps opening meanwhile
+            await asyncio.wait({recall}, timeout=self.recall_deadline)
+            
+            # a late recall still lands in the recall cache
+            if not recall.done() or recall.cancelled() or recall.exception():
+                span.set(late=not recall.done(), memories=0)
+                return []
+            memories = self.to_memories(recall.result())
+            span.set(memories=len(memories))
+        return memories
+    
+    def to_memories(self, snapshot: dict) -> list[dict]:
         #print(snapshot)
         if not snapshot.get("documents"):
             return []
         
+        # never inject a snapshot that is still in the history, once it's
+        # evicted or summarised away it can be recalled again
+        present = {message.get("content") for message in self.llm.messages 
+                   if message.get("role") == "Memory"}
+        
         memories = []
         for document, metadata in zip(snapshot.get("documents", []),
-                                        snapshot.get("metadatas", [])):
+                                      snapshot.get("metadatas", [])):
             text = f"{document}\n[metadata: {metadata}]"
+            if text in present:
+                continue
+            present.add(text)
             memories.append(to_lmc(text, role="Memory", type="memory snapshot"))
         
         #print(memories)
         return memories
     
-    def add_memory(self, memory):
+    def parse_memory(self, memory) -> dict | None:
         # check if ai fails to format json
         try: memory = json.loads(memory)
         except: return
         
+        # batched turns may return several memories
+        memories = memory if isinstance(memory, list) else [memory]
+        
         # check memory defined correctly
-        if not memory.get("memory"): 
+        memories = [memory for memory in memories 
+                    if isinstance(memory, dict) and memory.get("memory")]
+        if not memories: 
             return
-            
-        kwargs = {"documents": [memory["memory"]],
-                  "ids": [generate_id()],
-                  "metadatas": [memory.get("metadata", {}) | 
-                                {"time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}]}
-        self.ltm.add(**kwargs)
-
         
-    def memorise(self, messages):
-        memory = self.llm.chat("\n\n".join(map(to_chat, messages)), 
-                               system=self.prompts["memorise"],
-                               remember=False,
-                               stream=False)
+        time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return {"documents": [memory["memory"] for memory in memories],
+                "ids": [generate_id() for _ in memories],
+                "metadatas": [memory.get("metadata", {}) | {"time": time}
+                              for memory in memories]}
+    
+    async def write_memories(self, **kwargs):
+        ltm = (await self.collections())["ltm"]
+        await ltm.add(**kwargs)
+        # invalidates cached recalls
+        self.generation += 1
+    
+    @property
+    def ltm(self):
+        # sync collection, only opened for `add_memory`
+        if self._ltm is None:
+            self._ltm = self.memory_manager.connect().get_or_create_collection("ltm")
+        return self._ltm
+    
+    def add_memory(self, memory):
+        if (kwargs := self.parse_memory(memory)):
+            self.ltm.add(**kwargs)
+            self.generation += 1
+
+    async def memorise(self, messages):
+        with metrics.span("memorise", turns=len(messages)):
+            memory = await self._gather(self.llm.chat("\n\n".join(map(to_chat, messages)), 
+                                                      system=self.prompts["memorise"],
+                                                      remember=False,
+                                                      history=False,
+                                                      stream=True))
         if not memory: return
-        self.add_memory(memory)
+        return self.parse_memory(memory)
         
     def thread_memorise(self, messages: list[str]):
-        thread = threading.Thread(target=self.memorise, args=[messages])
-        thread.start()
-        thread.join()
+        # batched by the policy, written in the background by the memory worker
+        if (messages := self.memorise_policy.submit(messages)):
+            self.memoriser.put(messages)
+            
+    def flush_memories(self):
+        if self.memoriser.closed:
+            return
+        if (messages := self.memorise_policy.flush()):
+            self.memoriser.put(messages)
+        # backpressure counters of the session, see `MemoryWorker.metrics`
+        with metrics.span("memoriser") as span:
+            self.memoriser.close(timeout=self.memoriser_timeout)
+            span.set(**self.memoriser.metrics)
+        # how many llm calls the policy saved and how often recalls were cached
+        with metrics.span("memory", **self.memorise_policy.metrics, **self.recall_cache.metrics):
+            pass
+        
+    def interpret(self, block: dict, notebooks: dict, running: list) -> dict:
+        if block.get("type", None) == "code":
+            language, code = block.get("format"), block.get("content")
+            if language in notebooks: notebooks[language] += "\n\n" + code
+            else: notebooks[language] = code
         
+        elif "let's run the code" in block.get("content").lower() and notebooks:
+            running += zip(notebooks, self.computer.run_many(notebooks))
+            return {}
+        return notebooks
+    
     async def streaming_chat(self, 
                              message: str = None, 
                              remember=True,
                              timeout=None,
                              lmc=False):
-        
-        timeout = timeout or self.safeguards["timeout"]
+
+        with metrics.span("turn") as span:
+            timeout = timeout or self.safeguards["timeout"]
     
-        response, notebooks, hidden = "", {}, False
-        for _ in range(timeout):
-            # TODO: clean up. this is really messy.
-            
-            # remember anything relevant
-            
-            if not lmc and (memory := await self.remember(message)):
+            response, notebooks, hidden = "", {}, Hidden()
+        
+            # remember anything relevant, once per user turn
+            if not lmc and (memory := await self.speculative_remember(message)):
                 #print(memory)
                 # if self.dev or self.verbose:
                 #     for chunk in memory:
                 #         yield chunk
                 self.llm.messages += memory
             
-            async for chunk in self.llm.chat(message=message, 
-                                             stream=True,
-                                             remember=remember, 
-                                             lmc=lmc):
-                response += chunk
-                if self.conversational:
-                    if self.verbose or self.dev:
-                        pass
-                    elif "<hidden>" in chunk:
-                        hidden = True
-                        continue
-                    elif "</hidden>" in chunk:
-                        hidden = False
-                        continue
+            for thought in range(timeout):
+                # TODO: clean up. this is really messy.
+                span.set(thoughts=thought + 1)
+            
+                # blocks are parsed while streaming, notebooks start
+                # running as soon as the model asks for it
+                parser, running, last = StreamParser(), [], {}
+                # deltas are coalesced into frames first, everything below runs once per frame
+                async for chunk in coalesce(self.llm.chat(message=message, 
+                                                          stream=True,
+                                                          remember=remember, 
+                                                          lmc=lmc),
+                                            **self.frames):
+                    response += chunk
+                    for block in parser.feed(chunk):
+                        last, notebooks = block, self.interpret(block, notebooks, running)
+                    
+                    if self.conversational and not (self.verbose or self.dev):
+                        chunk = hidden.visible(chunk)
                 
-                if not hidden:
-                    yield chunk
+                    if chunk:
+                        # first visible chunk, recall included
+                        span.mark("ttft")
+                        yield chunk
+            
+                for block in parser.close():
+                    last, notebooks = block, self.interpret(block, notebooks, running)
                 
-            if self.conversational:
-                yield "<end>"
+                if self.conversational:
+                    if (rest := "".join(text for secret, text in hidden.close() if not secret)):
+                        yield rest
+                    yield END
                 
-            # memorise if relevant
-            memorise = [] if lmc else [to_lmc(message, role="User")]
-            self.thread_memorise(self.llm.messages[:-3] + memorise + [to_lmc(response)])
+                # memorise if relevant, the turn is read straight from the history when it's kept
+                if remember and message:
+                    self.thread_memorise(self.llm.messages.tail(2))
+                else:
+                    memorise = ([message] if lmc else [to_lmc(message, role="User")]) if message else []
+                    self.thread_memorise(memorise + [to_lmc(response)])
                 
-            # because of this, it's only partially async
-            # will fix in future versions
-            lmc = False
+                # outputs are delivered in the order the notebooks were written
+                lmc, outputs = False, []
+                for language, execution in running:
+                    if self.dev or self.verbose: 
+                        async for text in execution.stream():
+                            yield to_lmc(text, role="computer", type="stream", format="output")
+                    outputs.append((language, await execution))
             
-            for chunk in interpret_input(response): 
-                if chunk.get("type", None) == "code":
-                    language, code = chunk.get("format"), chunk.get("content")
-                    if language in notebooks: notebooks[language] += "\n\n" + code
-                    else: notebooks[language] = code
-                
-                elif "let's run the code" in chunk.get("content").lower():
-                    for language, code in notebooks.items():
-                        output = self.computer.run(code, language)
-                        message, lmc = to_lmc(output, role="computer", format="output"), True
-                        if self.dev or self.verbose: 
-                            yield message
-                    notebooks = {}
+                if outputs:
+                    output = (outputs[0][1] if len(outputs) == 1 else 
+                              "\n\n".join(f"[{language}]\n{output}" for language, output in outputs))
+                    message, lmc = to_lmc(output, role="computer", format="output"), True
                     
-            response = ""
-            if not lmc or chunk.get("content", "").lower().endswith(self.breakers):
-                return
+                response = ""
+                if not lmc or last.get("content", "").lower().endswith(self.breakers):
+                    return
+    
+            raise Warning("MindFlow has exceeded it's timeout stream of thoughts!")
     
-        raise Warning("MindFlow has exceeded it's timeout stream of thoughts!")
+    async def close(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.flush_memories)
+        self.computer.close()
+        await self.llm.close()
+        metrics.close()
     
     async def _gather(self, gen):
         return "".join([str(chunk) async for chunk in gen])
@@ -1,18 +1,44 @@
-from .browser import Browser, BrowserKwargs
-from .email import Email, EmailKwargs
-
 from ..utils import ROOT_DIR, Kwargs
 from pathlib import Path
 import importlib
 
+# name -> (module, attribute), imported on first access only
+# so `import mindflow.extensions` never pulls in playwright, chromadb & co.
+REGISTRY = {
+    "Browser": (".browser", "Browser"),
+    "BrowserKwargs": (".browser", "BrowserKwargs"),
+    "Email": (".email", "Email"),
+    "EmailKwargs": (".email", "EmailKwargs"),
+}
+
 def load_extensions():
     with open(Path(ROOT_DIR, "extensions", "extensions.txt"), "r") as f:
         extensions = f.read().splitlines()
-    
-    for module_name in extensions:
-        module = importlib.import_module(module_name)
-        globals()[module_name] = getattr(module, module_name.title())
-        if (kwargs := getattr(module, module_name.title()+"Kwargs")):
-            globals()[module_name+"Kwargs"] = kwargs
+
+    for module_name in filter(None, extensions):
+        REGISTRY[module_name] = (module_name, module_name.title())
+        REGISTRY[module_name+"Kwargs"] = (module_name, module_name.title()+"Kwargs")
+
+def load_instructions(name: str) -> str:
+    # built-in extensions ship their instructions as plain files,
+    # no need to import the extension to read them
+    module, _ = REGISTRY.get(name, ("", ""))
+    path = Path(ROOT_DIR, "extensions", module.lstrip("."), "docs", "instructions.md")
+    if module.startswith(".") and path.is_file():
+        with open(path, "r") as f:
+            return f.read()
+    return __getattr__(name).load_instructions()
+
+def __getattr__(name: str):
+    if name not in REGISTRY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module, attribute = REGISTRY[name]
+    value = getattr(importlib.import_module(module, package=__package__), attribute, None)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(REGISTRY))
 
 load_extensions()
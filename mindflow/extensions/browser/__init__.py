@@ -3,8 +3,7 @@ import asyncio
 from pathlib import Path 
 from ...llm import LLM
 from ...utils import ROOT_DIR, lazy_import
-from ...memory.client import Memory
-from chromadb.config import Settings
+from ...memory.client import connect_async, exported
 
 # playwright = lazy_import("playwright",
 #                          scripts=[["playwright", "install"]])
@@ -13,6 +12,8 @@ from playwright.async_api import async_playwright
 
 from .utils.general import to_markdown
 from ...utils import get_relevant, generate_id
+from ...utils.metrics import metrics
+from ...utils.cassette import Cassette, CassetteMissing
 import importlib
 import browsers
 import random
@@ -28,17 +29,18 @@ class BrowserKwargs(TypedDict):
 class Browser:
     def __init__(self, 
                  headless=True, 
-                 engine="google"):
+                 engine="google",
+                 cassette: Cassette = None):
         # Temp solution, loads widgets from ALL engines
         # Should only load widgets from chosen engine
         
         # points to current mindflow instance
         self.headless = headless
-        self.llm = LLM()
-        self.context = Memory(host='localhost', 
-                              port=8000,
-                              settings=Settings(anonymized_telemetry=False))
-        self.browser_context = self.context.get_or_create_collection("cache")
+        
+        # recorded page loads and searches, replayed offline (see `utils.cassette`)
+        self.cassette = cassette or Cassette.from_env()
+        self.llm = LLM(cassette=self.cassette)
+        self.browser_context = None
 
         with open(Path(__file__).parent / "src" / "engines.json", "r") as f:
             self.engines = json.load(f)
@@ -62,7 +64,20 @@ class Browser:
     
         # Init browser at runtime for faster speeds in the future
         self.loop = asyncio.get_event_loop()
-        self.loop.run_until_complete(self.init_playwright())
+        self.browser = None
+        if not (self.cassette and self.cassette.offline):
+            self.loop.run_until_complete(self.init_playwright())
+    
+    async def cache(self):
+        # short-term store for loaded pages, shared with mindflow
+        if self.browser_context is None:
+            self.browser_context = asyncio.ensure_future(self.connect_cache())
+        return await self.browser_context
+    
+    async def connect_cache(self):
+        # mindflow's server when it runs one, a private in-memory store next to an embedded one
+        self.context = await connect_async(ephemeral=not exported())
+        return await self.context.get_or_create_collection("cache")
     
     @staticmethod
     def load_instructions():
@@ -70,8 +85,22 @@ class Browser:
             return f.read()
 
     async def close_playwright(self):
-        await self.browser.close()
-        await self.playwright.stop()
+        if self.browser:
+            await self.browser.close()
+            await self.playwright.stop()
+        await self.llm.close()
+    
+    async def new_page(self):
+        # offline replays start no browser, so whatever the cassette didn't record ends up here
+        if self.browser is None and self.cassette and self.cassette.offline:
+            raise CassetteMissing(f"Browser calls other than those recorded in `{self.cassette.path}` "
+                                  "are not available in replay mode")
+        return await self.browser.new_page()
+    
+    async def recorded(self, kind: str, request: dict, source):
+        if self.cassette is None:
+            return await source()
+        return await self.cassette.call(kind, request, source)
         
     async def init_playwright(self):
         installed_browsers = {browser['display_name']:browser
@@ -151,7 +180,11 @@ class Browser:
         return self.loop.run_until_complete(self.run_perplexity_search(query))
         
     async def run_perplexity_search(self, query: str): 
-        async with await self.browser.new_page() as page:
+        return await self.recorded("browser.perplexity", {"query": query},
+                                   lambda: self.load_perplexity(query))
+    
+    async def load_perplexity(self, query: str):
+        async with await self.new_page() as page:
             try:
                 await page.goto("https://www.perplexity.ai/search/new?q=" + query)
                 copy = await self.check_visibility_while_waiting(page,
@@ -173,10 +206,16 @@ class Browser:
                                 query: str, 
                                 n: int = 3,
                                 engine: str = "google"):
-
+        return await self.recorded("browser.search", {"query": query, "n": n, "engine": engine},
+                                   lambda: self.load_search(query, n, engine))
+    
+    async def load_search(self, 
+                          query: str, 
+                          n: int = 3,
+                          engine: str = "google"):
 
         results = (f"Error: An error occured with {engine} search.",)
-        async with await self.browser.new_page() as page:
+        async with await self.new_page() as page:
     
             engine = self.engines.get(self.browser_engine, engine)
             await page.goto(engine["engine"] + query) 
@@ -195,15 +234,21 @@ class Browser:
 
         return results
     
-    async def playwright_load(self, url, clean: bool = False, to_context=False, void=False):
-        async with await self.browser.new_page() as page:
+    async def load_page(self, url, clean: bool = False):
+        async with await self.new_page() as page:
             await page.goto(url) 
             
             if not clean:
                 return await page.content()
             
             body = await page.query_selector('body')
-            html = await body.inner_html() 
+            return await body.inner_html() 
+    
+    async def playwright_load(self, url, clean: bool = False, to_context=False, void=False):
+        html = await self.recorded("browser.load", {"url": url, "clean": clean},
+                                   lambda: self.load_page(url, clean))
+        if not clean:
+            return html
         
         contents = to_markdown(html, 
                                 ignore=['header', 'footer', 'nav', 'navbar'],
@@ -221,7 +266,7 @@ class Browser:
         if to_context:
             # temp, will improve
             contents = contents.split("###")
-            self.browser_context.add(
+            await (await self.cache()).add(
                 documents=contents,
                 metadatas=[{"source": "browser"} 
                            for _ in range(len(contents))], # filter on these!
@@ -240,38 +285,44 @@ class Browser:
                engine: str = "google",
                local: bool = False):
         
-        # TODO: add a cache
-        
-        # search WITH perplexity.ai
-        if not local and (result := self.perplexity_search(query)):
-            return result
+        with metrics.span("browser.search", engine=engine) as span:
+            # TODO: add a cache
+            
+            # search WITH perplexity.ai
+            if not local and (result := self.perplexity_search(query)):
+                span.set(source="perplexity")
+                return result
                 
-        # FALLBACK
-        # search LIKE perplexity.ai (locally)
-        # uses embeddings :D
+            # FALLBACK
+            # search LIKE perplexity.ai (locally)
+            # uses embeddings :D
         
-        sites = self.loop.run_until_complete(self.playwright_search(query, n, engine))
-        self.parallel(*(self.playwright_load(url=site["link"], 
-                                             clean=True, 
-                                             to_context=True, 
-                                             void=True)
-                        for site in sites))
+            sites = self.loop.run_until_complete(self.playwright_search(query, n, engine))
+            span.set(source="local", sites=len(sites))
+            self.parallel(*(self.playwright_load(url=site["link"], 
+                                                 clean=True, 
+                                                 to_context=True, 
+                                                 void=True)
+                            for site in sites))
                     
-        n = n*3 if 10 > n*3 else 9
-        relevant = get_relevant(self.browser_context.query(query_texts=[query], 
-                                                                n_results=n),
-                                clean=True)
+            n = n*3 if 10 > n*3 else 9
+            relevant = get_relevant(self.loop.run_until_complete(self.query_cache(query, n)),
+                                    clean=True)
         
-        prompt = self.settings["prompts"]["summarise"] 
-        if cite:
-            prompt += self.settings["prompts"]["citations"]
+            prompt = self.settings["prompts"]["summarise"] 
+            if cite:
+                prompt += self.settings["prompts"]["citations"]
         
-        result = self.llm.chat(relevant, 
-                               role="browser",
-                               system=prompt)
-        return result
+            result = self.llm.chat(relevant, 
+                                   role="browser",
+                                   system=prompt)
+            return result
 
     
+    async def query_cache(self, query: str, n: int):
+        return await (await self.cache()).query(query_texts=[query], 
+                                                n_results=n)
+    
     def widget_search(self,
                       query: str,
                       widget: str,
@@ -294,7 +345,7 @@ class Browser:
                                 engine: str = "google") -> dict:
         
         engine = self.engines.get(self.browser_engine, {})
-        async with await self.browser.new_page() as page:
+        async with await self.new_page() as page:
             await page.goto(engine["engine"] + query) 
 
             try:
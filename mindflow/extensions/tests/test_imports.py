@@ -0,0 +1,31 @@
+import subprocess
+import sys
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("toml")
+
+HEAVY = ("playwright", "chromadb", "bs4", "markdownify", "pybrowsers")
+
+ROOT = Path(__file__).parents[3]
+
+def imported(statement: str) -> dict:
+    # fresh interpreter, so nothing is cached from other tests
+    script = (
+        "import sys, json\n"
+        f"{statement}\n"
+        "print(json.dumps({'modules': list(sys.modules)}))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, cwd=ROOT)
+    return json.loads(result.stdout.splitlines()[-1])
+
+def test_extensions_are_lazy():
+    result = imported("import mindflow.extensions")
+    # what made a cold import take seconds, checked instead of wall-clock time
+    assert not [name for name in HEAVY if name in result["modules"]]
+
+def test_instructions_without_import():
+    result = imported("import mindflow.extensions as e; e.load_instructions('Browser')")
+    assert "mindflow.extensions.browser" not in result["modules"]
@@ -1,5 +1,8 @@
 from datetime import datetime
 from .models.samba import SambaNova
+from .context import Context
+from .store import MessageStore
+from .frames import Hidden, coalesce, END
 
 import os
 import re
@@ -38,6 +41,56 @@ def interpret_input(input_str):
     
     return blocks
 
+class StreamParser:
+    """
+    Incremental `interpret_input`.
+    Fed chunks as they stream, returns message lines and code blocks as soon as they are complete.
+    """
+    fence = re.compile(r'```(?P<format>\w+)\n')
+    
+    def __init__(self):
+        self.buffer = ""
+        self.format = None
+    
+    def feed(self, chunk: str) -> list[dict]:
+        self.buffer += chunk
+        blocks = []
+        while True:
+            if self.format is not None:
+                # inside a code block, wait for the closing fence
+                end = self.buffer.find("```", 1)
+                if end == -1:
+                    break
+                blocks.append({"type": "code",
+                               "format": self.format,
+                               "content": self.buffer[:end].strip()})
+                self.buffer, self.format = self.buffer[end + 3:], None
+                continue
+            
+            # like `interpret_input`, a fence only opens where a line starts
+            # (or right after a closing fence), prose before it keeps the line as text
+            newline = self.buffer.find("\n")
+            match = self.fence.match(self.buffer)
+            if match:
+                self.buffer, self.format = self.buffer[match.end():], match.group("format")
+            elif newline != -1:
+                blocks += self.message(self.buffer[:newline])
+                self.buffer = self.buffer[newline + 1:]
+            else:
+                break
+        return blocks
+    
+    def close(self) -> list[dict]:
+        # unterminated code blocks are plain text, like in `interpret_input`
+        rest = self.buffer if self.format is None else f"```{self.format}\n{self.buffer}"
+        self.buffer, self.format = "", None
+        return [block for line in rest.split("\n") for block in self.message(line)]
+        
+    @staticmethod
+    def message(text: str) -> list[dict]:
+        text = text.strip()
+        return [{"type": "message", "content": text}] if text else []
+
 def to_lmc(content: str, role: str = "assistant", type="message", format: str | None = None) -> dict:            
     lmc = {"role": role, "type": type, "content": content} 
     return lmc | ({} if format is None else {"format": format})
@@ -62,7 +115,7 @@ def to_chat(lmc: dict, logs=False) -> str:
     return f'({time}) [type: {_type if _format is None else f"{_type}, format: {_format}"}] *{_role}*: {_content}'
 
 class LLM:
-    def __init__(self, verbose=False, messages: list = None, system=""):
+    def __init__(self, verbose=False, messages: list = None, system="", cassette=None, context: Context = None):
         self.system = system
 
         self.verbose = verbose
@@ -70,14 +123,25 @@ class LLM:
         if not (api_key := os.getenv('API_KEY')) :
             raise Exception("API_KEY for LLM not provided. Get yours for free from https://cloud.sambanova.ai/")
         
+        # API_ENDPOINT points at any compatible server, e.g. the benchmarks' mock
+        endpoint = {"endpoint": os.getenv("API_ENDPOINT")} if os.getenv("API_ENDPOINT") else {}
         self.llm = SambaNova(api_key=api_key,
                              model="Meta-Llama-3.1-405B-Instruct",
                              remember=True,
                              system=self.system,
-                             messages=[] if messages is None else messages)
+                             messages=[] if messages is None else messages,
+                             cassette=cassette,
+                             context=context,
+                             **endpoint)
         self.messages = self.llm.messages
             
     def chat(self, *args, **kwargs):
         if self.system and not "system" in kwargs:
             return self.llm.chat(*args, **kwargs, system=self.system, max_tokens=1400)
         return self.llm.chat(*args, **kwargs, max_tokens=1400)
+    
+    async def warmup(self):
+        await self.llm.warmup()
+    
+    async def close(self):
+        await self.llm.close()
@@ -0,0 +1,73 @@
+from .store import MessageStore, Slot, tokens
+
+SUMMARISE = """You compact a conversation between a user, an assistant and the computer it runs code on, so it fits a limited context window.
+Merge the previous summary (if any) with the new messages into ONE concise summary, in the third person.
+Keep everything needed to continue the conversation: the user's goals, preferences and facts about them, decisions made, code that was written and what it did, results, errors and open questions.
+Drop greetings, filler and repeated output. Return ONLY the summary."""
+
+class Context:
+    """
+    Keeps the prompt inside the model's window.
+    Requests that would overflow are trimmed oldest first (`fit`), while old turns
+    are folded into a rolling summary in the background (`stale` + `compacted`).
+
+    window: model context in tokens
+    keep: most recent messages never summarised
+    compact: fraction of the budget that triggers a summary
+    summary: max tokens of a summary
+    """
+    role = "Summary"
+
+    def __init__(self,
+                 window: int = 8192,
+                 keep: int = 6,
+                 compact: float = 0.75,
+                 summary: int = 400,
+                 prompt: str = SUMMARISE):
+        self.window = window
+        self.keep = keep
+        self.compact = compact
+        self.summary = summary
+        self.prompt = prompt
+
+    def budget(self, *reserved: dict, max_tokens: int = 0) -> int:
+        # what's left for history next to the system prompt, the new message and the reply
+        return self.window - max_tokens - sum(map(tokens, reserved))
+
+    def fit(self, messages: MessageStore, budget: int) -> list[Slot]:
+        # newest first until the budget is spent, the rest is left out of this request
+        # (normally never happens, the rolling summary keeps history well below it)
+        slots = messages.slots
+        if (total := messages.tokens) <= budget:
+            return slots
+
+        # the summary is the cheapest record of what is dropped, it goes last
+        head = [slots[0]] if slots and slots[0].message.get("role") == self.role else []
+        start = len(head)
+        while start < len(slots) and total > budget:
+            total -= slots[start].tokens
+            start += 1
+        if total > budget:
+            head = []
+        return head + [slots[index] for index in range(start, len(slots))]
+
+    def stale(self, messages: MessageStore, limit: int = None, max_tokens: int = 0) -> list[dict]:
+        # the oldest messages (including the previous summary) once history grows too large
+        over = messages.tokens > self.compact * (self.window - max_tokens)
+        if not over and (limit is None or len(messages) <= limit):
+            return []
+        return messages[:max(0, len(messages) - self.keep)]
+
+    def request(self, stale: list[dict]) -> list[dict]:
+        text = "\n\n".join(f"{message['role']}: {message['content']}" for message in stale)
+        return [{"role": "system", "content": self.prompt},
+                {"role": "user", "content": text}]
+
+    def compacted(self, messages: MessageStore, stale: list[dict], summary: str) -> bool:
+        # replaces the stale prefix with its summary, unless history moved on meanwhile
+        if not summary.strip() or len(messages) < len(stale):
+            return False
+        if any(current is not old for current, old in zip(messages, stale)):
+            return False
+        messages.replace(len(stale), {"role": self.role, "content": summary.strip()})
+        return True
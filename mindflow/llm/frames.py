@@ -0,0 +1,103 @@
+import asyncio
+
+END = "<end>"
+
+class Hidden:
+    """
+    `<hidden>` ... `</hidden>` as a state machine over streamed text.
+    Fed chunks, returns `(hidden, text)` segments with the tags removed.
+    A tag split across chunks is held back until it is complete, so `<hid` + `den>` still hides.
+    """
+    tags = {"<hidden>": True, "</hidden>": False}
+
+    def __init__(self, hidden: bool = False):
+        self.hidden = hidden
+        self.buffer = ""
+
+    def feed(self, chunk: str) -> list[tuple[bool, str]]:
+        text, self.buffer = self.buffer + chunk, ""
+        segments = []
+        while (start := text.find("<")) != -1:
+            rest = text[start:]
+            tag = next((tag for tag in self.tags if rest.startswith(tag)), None)
+            if tag is None:
+                if any(tag.startswith(rest) for tag in self.tags):
+                    # possibly the start of a tag, wait for the next chunk
+                    text, self.buffer = text[:start], rest
+                    break
+                self.emit(segments, text[:start + 1])
+                text = text[start + 1:]
+                continue
+            self.emit(segments, text[:start])
+            self.hidden, text = self.tags[tag], text[start + len(tag):]
+        self.emit(segments, text)
+        return segments
+
+    def emit(self, segments: list, text: str):
+        if not text:
+            return
+        if segments and segments[-1][0] == self.hidden:
+            segments[-1] = (self.hidden, segments[-1][1] + text)
+        else:
+            segments.append((self.hidden, text))
+
+    def visible(self, chunk: str) -> str:
+        return "".join(text for hidden, text in self.feed(chunk) if not hidden)
+
+    def close(self) -> list[tuple[bool, str]]:
+        # an unfinished tag at the end of a stream is just text
+        segments, text, self.buffer = [], self.buffer, ""
+        self.emit(segments, text)
+        return segments
+
+async def coalesce(stream, size: int = 256, interval: float = 0.02):
+    """
+    Merges a stream's text deltas into frames, so consumers handle one string
+    per `interval` seconds (or `size` characters) instead of one per token.
+    A delta arriving after a quiet `interval` is passed on at once, and a frame
+    is flushed when its window ends even if the stream stalls, so text is never
+    held for more than `interval`. Anything that isn't text (dicts, `<end>`)
+    flushes the frame and is passed on by itself.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = stream.__aiter__()
+    frame, flushed, step = "", float("-inf"), None
+    try:
+        while True:
+            # the next item is awaited as a task, so the window can end without cancelling it
+            step = step or asyncio.ensure_future(iterator.__anext__())
+            if frame:
+                done, _ = await asyncio.wait({step}, timeout=max(0, flushed + interval - loop.time()))
+                if not done:
+                    yield frame
+                    frame, flushed = "", loop.time()
+                    continue
+            try:
+                item = await step
+            except StopAsyncIteration:
+                break
+            finally:
+                step = None
+
+            if not isinstance(item, str) or item == END:
+                if frame:
+                    yield frame
+                    frame = ""
+                flushed = float("-inf")
+                yield item
+                continue
+
+            frame += item
+            if len(frame) >= size or loop.time() - flushed >= interval:
+                yield frame
+                # the window starts once the consumer is done with the frame
+                frame, flushed = "", loop.time()
+        if frame:
+            yield frame
+    finally:
+        # the consumer stopped early, nothing is left running behind it
+        if step is not None:
+            step.cancel()
+            await asyncio.wait({step})
+        if hasattr(stream, "aclose"):
+            await stream.aclose()
@@ -1,9 +1,15 @@
 from pathlib import Path
 from random import choice
 from rich import print
+from ...utils.metrics import metrics
+from ...utils.cassette import Cassette
+from ..context import Context
+from ..store import MessageStore, body
+from ..sse import SSEDecoder, loads
 import aiohttp
 import asyncio
 import json
+import time
 
 def to_lmc(content: str, role: str = "assistant") -> dict: 
     return {"role": role, "content": content}
@@ -19,7 +25,12 @@ class SambaNova:
                  system="You are a helpful assistant.",
                  remember=False,
                  limit=30,
-                 endpoint= "https://api.sambanova.ai/v1/chat/completions"):
+                 endpoint= "https://api.sambanova.ai/v1/chat/completions",
+                 connections=8,
+                 keepalive=75,
+                 dns_ttl=300,
+                 cassette: Cassette = None,
+                 context: Context = None):
     
         if model in available(): 
             self.model = model
@@ -27,82 +38,195 @@ class SambaNova:
             self.model = "Meta-Llama-3.1-8B-Instruct"
         
         self.api_key = api_key
-        self.messages = [] if messages is None else messages
+        self.messages = messages if isinstance(messages, MessageStore) else MessageStore(messages)
         self.remember = remember
         self.limit = limit
         self.system = to_lmc(system, role="system")
         self.endpoint = endpoint
         self.loop = asyncio.get_event_loop()
-            
-    async def async_stream_chat(self, data, remember=False):
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.endpoint, 
-                                    headers={"Authorization": f"Bearer {self.api_key}"}, 
-                                    json=data) as response:
-                message = ""
-                async for line in response.content:
-                    if line:
-                        decoded_line = line.decode('utf-8')[6:]
-                        if not decoded_line or decoded_line.strip() == "[DONE]":
-                            continue
         
-                        try:
-                            json_line = json.loads(decoded_line)
-                        except json.JSONDecodeError as e:
-                            print(line)
-                            raise json.JSONDecodeError(e) # better implementation for later
-                        
-                        if json_line.get("error"):
-                            yield json_line.get("error", {}).get("message", "An unexpected error occured!")
+        # pooled connections, one session per event loop
+        # (aiohttp sessions can't be shared across loops)
+        self.connections = connections
+        self.keepalive = keepalive
+        self.dns_ttl = dns_ttl
+        self.sessions = {}
+        self.used = 0
+        
+        # recorded streams, replayed offline (see `utils.cassette`)
+        self.cassette = cassette or Cassette.from_env()
+        
+        # token budget, old turns are summarised rather than dropped
+        self.context = context or Context()
+        self.compacting = None
+    
+    def session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        session = self.sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connections,
+                                             keepalive_timeout=self.keepalive,
+                                             ttl_dns_cache=self.dns_ttl,
+                                             use_dns_cache=True)
+            session = aiohttp.ClientSession(connector=connector,
+                                            headers={"Authorization": f"Bearer {self.api_key}"})
+            self.sessions[loop] = session
+        return session
+    
+    async def warmup(self):
+        # opens a pooled connection ahead of the next request,
+        # skipped while the last one should still be kept alive
+        if time.monotonic() - self.used < self.keepalive or (self.cassette and self.cassette.offline):
+            return
+        
+        try:
+            async with self.session().get(self.endpoint.rsplit("/chat/", 1)[0] + "/models") as response:
+                await response.read()
+        except aiohttp.ClientError:
+            return
+        self.used = time.monotonic()
+    
+    async def close(self):
+        # sessions can only be closed from the loop that owns them
+        current = asyncio.get_running_loop()
+        for loop, session in list(self.sessions.items()):
+            if loop is current:
+                await session.close()
+            elif loop.is_closed() and session.connector is not None:
+                # its loop is gone, nothing can be awaited any more,
+                # the pool is dropped so it isn't reported as leaked
+                session.connector._close()
+                session.detach()
+            else:
+                continue
+            del self.sessions[loop]
+        # a task can only be cancelled from its own loop, e.g. not from the memoriser's
+        if self.compacting and not self.compacting.done() and self.compacting.get_loop() is current:
+            self.compacting.cancel()
+            
+    async def post(self, data: str):
+        async with self.session().post(self.endpoint, data=data, headers={"Content-Type": "application/json"}) as response:
+            if response.status >= 400:
+                # plain json errors, passed on as an sse error event
+                error = {"error": {"message": f"{response.status} {response.reason}: {(await response.text())[:500]}"}}
+                yield b"data: " + json.dumps(error).encode() + b"\n\n"
+                return
+            
+            async for chunk in response.content.iter_any():
+                yield chunk
+    
+    def chunks(self, data):
+        # raw network chunks, so replays go through the same decoding
+        if self.cassette is None:
+            return self.post(data)
+        return self.cassette.stream("sambanova", data, lambda: self.post(data))
+    
+    async def events(self, data):
+        decoder = SSEDecoder()
+        async for chunk in self.chunks(data):
+            for event in decoder.feed(chunk):
+                # `[DONE]` and anything that isn't json (e.g. proxies' notices) is skipped
+                if (event := loads(event)) is not None:
+                    yield event
+        for event in decoder.close():
+            if (event := loads(event)) is not None:
+                yield event
+    
+    async def async_stream_chat(self, data: str, remember=None, strict=False, max_tokens=1400):
+        remember = self.remember if remember is None else remember
+        self.used = time.monotonic()
+        with metrics.span("llm", model=self.model) as span:
+            message, chunks = "", 0
+            async for json_line in self.events(data):
+                if isinstance(json_line, dict):
+                    if (error := json_line.get("error")):
+                        error = (error.get("message", "An unexpected error occured!") 
+                                 if isinstance(error, dict) else str(error))
+                        if strict:
+                            raise RuntimeError(error)
+                        yield error
                     
-                        options = json_line.get("choices", [{"finish_reason": "end_of_text"}])[0]
-                        if options.get("finish_reason") == "end_of_text":
-                            continue
-
-                        chunk = options.get('delta', {}).get('content', '')
-                        if self.remember or remember:
-                            message += chunk
-
-                        yield chunk
+                    if span and (usage := json_line.get("usage")):
+                        span.set(tokens=usage.get("completion_tokens", chunks))
                 
-                if self.remember or remember:
-                    self.messages.append(to_lmc(message))
-                    if (length := len(self.messages)) > self.limit:
-                        del self.messages[0]
+                    options = (json_line.get("choices") or [{"finish_reason": "end_of_text"}])[0]
+                    if options.get("finish_reason") == "end_of_text":
+                        continue
 
+                    chunk = (options.get('delta') or {}).get('content') or ''
+                    if remember:
+                        message += chunk
+                    
+                    span.mark("ttft")
+                    chunks += 1
+                    yield chunk
+            
+            if remember:
+                self.messages.append(to_lmc(message))
+                self.schedule_compaction(max_tokens)
+        
+            if span and chunks:
+                # generation rate, excluding the wait for the first token
+                tokens = span.attributes.setdefault("tokens", chunks)
+                span.set(chunks=chunks, tokens_per_second=tokens / max(span.elapsed() - span.attributes["ttft"], 1e-6))
+
+    def schedule_compaction(self, max_tokens: int):
+        # one summary at a time, in the background of the current loop
+        if self.compacting and not self.compacting.done():
+            return
+        if (stale := self.context.stale(self.messages, self.limit, max_tokens)):
+            self.compacting = asyncio.ensure_future(self.compact(stale))
+    
+    async def compact(self, stale: list[dict]):
+        template = body(map(json.dumps, self.context.request(stale)),
+                        model=self.model,
+                        max_tokens=self.context.summary,
+                        stream=True)
+        try:
+            summary = "".join([chunk async for chunk in 
+                               self.async_stream_chat(template, remember=False, strict=True)])
+        except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError):
+            return
+        self.context.compacted(self.messages, stale, summary)
+    
     def chat(self, 
              message: str, 
              role="user", 
              stream=False,
              max_tokens=1400,
-             remember=False, 
+             remember=None, 
              lmc=False,
              asynchronous=True,
+             history=True,
              system: str = None):
         
         system = to_lmc(system, role="system") if system else self.system
         if not lmc:
             message = to_lmc(message, role=role)
         elif message is None:
-            message = self.messages[-1]
-            self.messages = self.messages[:-1]
-                    
-        template = {"model": self.model,
-                    "messages": [system] + self.messages + [message],
-                    "max_tokens": max_tokens,
-                    "stream": True} # lmao, we'll fix this later :p
+            message = self.messages.pop()
+        
+        # history is sent as its cached fragments, nothing is copied or re-serialised
+        budget = self.context.budget(system, message, max_tokens=max_tokens)
+        history = self.context.fit(self.messages, budget) if history else ()
+        template = body([json.dumps(system), *(slot.fragment for slot in history), json.dumps(message)],
+                        model=self.model,
+                        max_tokens=max_tokens,
+                        stream=True)
             
-        if self.remember or remember:
+        # explicit remember=False keeps side requests (e.g. memorise) out of history
+        remember = self.remember if remember is None else remember
+        if remember:
             self.messages.append(message)
             
         if stream: 
-            return self.async_stream_chat(template, remember)
-        return self.loop.run_until_complete(self.static_chat(template, remember))
+            return self.async_stream_chat(template, remember, max_tokens=max_tokens)
+        return self.loop.run_until_complete(self.static_chat(template, remember, max_tokens))
         
-    async def static_chat(self, template, remember):
+    async def static_chat(self, template, remember, max_tokens=1400):
         return "".join([chunk 
                         async for chunk in 
-                        self.async_stream_chat(template, remember)])
+                        self.async_stream_chat(template, remember, max_tokens=max_tokens)])
 
 async def main():
     llm = SambaNova("APIKEY",
@@ -0,0 +1,58 @@
+import json
+
+try:
+    # optional, `pip install mindflow[fast]`
+    import orjson
+except ImportError:
+    orjson = None
+
+def loads(payload: str | bytes):
+    # an event's json, None if it isn't any
+    try:
+        return orjson.loads(payload) if orjson else json.loads(payload)
+    except ValueError:
+        return None
+
+class SSEDecoder:
+    """
+    Incremental `text/event-stream` decoder.
+    Fed raw network chunks, returns the data of every complete event.
+    Lines split across chunks, multi-line data, `\\r\\n` line endings and
+    keep-alive comments are handled, other fields (`event`, `id`, `retry`) are ignored.
+    """
+    def __init__(self):
+        self.buffer = b""
+        self.data = []
+
+    def feed(self, chunk: bytes) -> list[str]:
+        if b"\n" not in chunk:
+            self.buffer += chunk
+            return []
+
+        lines = (self.buffer + chunk).split(b"\n")
+        self.buffer = lines.pop()
+        line = self.line
+        return [event for raw in lines if (event := line(raw)) is not None]
+
+    def line(self, line: bytes) -> str | None:
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        if not line:
+            # a blank line ends the event
+            return self.flush() if self.data else None
+
+        # comments (`:`) and other fields (`event`, `id`, `retry`) are ignored
+        if line.startswith(b"data:"):
+            self.data.append(line[6:] if line.startswith(b"data: ") else line[5:])
+        return None
+
+    def flush(self) -> str:
+        data, self.data = self.data, []
+        return (data[0] if len(data) == 1 else b"\n".join(data)).decode("utf-8", "replace")
+
+    def close(self) -> list[str]:
+        # a stream may end without the final blank line
+        events = [event for line in (self.buffer, b"")
+                  if (event := self.line(line)) is not None]
+        self.buffer = b""
+        return events
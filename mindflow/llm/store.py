@@ -0,0 +1,80 @@
+from collections import deque
+import json
+
+def tokens(message: dict) -> int:
+    # rough but cheap, ~4 characters per token plus the chat template's overhead
+    return len(str(message.get("content", ""))) // 4 + 4
+
+class Slot:
+    # a message with what every request needs from it, computed once
+    __slots__ = ("message", "tokens", "fragment")
+
+    def __init__(self, message: dict):
+        self.message = message
+        self.tokens = tokens(message)
+        self.fragment = json.dumps(message)
+
+class MessageStore:
+    """
+    Conversation history as a ring buffer of slots.
+    Token counts and JSON fragments are cached per message, so building a request
+    joins strings instead of copying and re-serialising the whole history.
+    Past `capacity` the oldest messages fall out (normally the rolling summary
+    in `Context` keeps history far below it).
+    """
+    def __init__(self, messages: list[dict] = None, capacity: int = 256):
+        self.slots = deque(maxlen=capacity)
+        self.tokens = 0
+        self.extend(messages or [])
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __iter__(self):
+        return (slot.message for slot in self.slots)
+
+    def __getitem__(self, index: int | slice) -> dict | list[dict]:
+        if isinstance(index, slice):
+            return [slot.message for slot in list(self.slots)[index]]
+        return self.slots[index].message
+
+    def __iadd__(self, messages: list[dict]) -> "MessageStore":
+        self.extend(messages)
+        return self
+
+    def append(self, message: dict):
+        if len(self.slots) == self.slots.maxlen:
+            self.tokens -= self.slots[0].tokens
+        slot = Slot(message)
+        self.slots.append(slot)
+        self.tokens += slot.tokens
+
+    def extend(self, messages: list[dict]):
+        for message in messages:
+            self.append(message)
+
+    def pop(self) -> dict:
+        slot = self.slots.pop()
+        self.tokens -= slot.tokens
+        return slot.message
+
+    def tail(self, n: int) -> list[dict]:
+        # the last `n` messages, without walking the rest
+        return [self.slots[index].message for index in range(max(0, len(self.slots) - n), len(self.slots))]
+
+    def replace(self, count: int, message: dict):
+        # the oldest `count` messages become `message` (e.g. their summary)
+        for _ in range(min(count, len(self.slots))):
+            self.tokens -= self.slots.popleft().tokens
+        slot = Slot(message)
+        self.slots.appendleft(slot)
+        self.tokens += slot.tokens
+
+    def clear(self):
+        self.slots.clear()
+        self.tokens = 0
+
+def body(fragments, **fields) -> str:
+    # a chat completion request, assembled from pre-serialised messages
+    head = json.dumps(fields)[1:-1]
+    return "{" + head + (", " if head else "") + '"messages": [' + ", ".join(fragments) + "]}"
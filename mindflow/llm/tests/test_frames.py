@@ -0,0 +1,56 @@
+import asyncio
+import random
+import time
+
+from mindflow.llm.frames import Hidden, coalesce, END
+
+TEXT = "Hi <there> a<b <hidden>secret < stuff</hidden> visible</hidden> end <hid"
+
+
+def test_hidden_tags_split_across_chunks():
+    for seed in range(200):
+        rand, hidden, segments, i = random.Random(seed), Hidden(), [], 0
+        while i < len(TEXT):
+            step = rand.randint(1, 5)
+            segments += hidden.feed(TEXT[i:i + step])
+            i += step
+        segments += hidden.close()
+        assert "".join(text for secret, text in segments if not secret) == "Hi <there> a<b  visible end <hid"
+        assert "".join(text for secret, text in segments if secret) == "secret < stuff"
+
+
+def test_hidden_state_carries_over():
+    hidden = Hidden()
+    assert hidden.visible("a<hid") == "a"
+    assert hidden.visible("den>b") == ""
+    assert hidden.visible("</hidden>c") == "c"
+
+
+async def deltas(*items):
+    for item, delay in items:
+        await asyncio.sleep(delay)
+        yield item
+
+
+async def frames(stream, **kwargs) -> list[tuple[float, str]]:
+    start = time.perf_counter()
+    return [(time.perf_counter() - start, frame) async for frame in coalesce(stream, **kwargs)]
+
+
+def test_coalesce_flushes_when_the_window_ends():
+    # `b` arrives inside the window, it must not wait for the stalled `c`
+    result = asyncio.run(frames(deltas(("a", 0), ("b", 0.005), ("c", 0.5)), interval=0.05))
+    assert [frame for _, frame in result] == ["a", "b", "c"]
+    assert result[1][0] < 0.2
+
+
+def test_coalesce_merges_fast_deltas():
+    result = asyncio.run(frames(deltas(*[("ab", 0.001)] * 50), interval=0.05))
+    assert "".join(frame for _, frame in result) == "ab" * 50
+    assert len(result) < 20
+
+
+def test_coalesce_passes_markers_alone():
+    stream = deltas(("a", 0), ("b", 0), (END, 0), ({"role": "computer"}, 0), ("c", 0))
+    result = asyncio.run(frames(stream, interval=1))
+    assert [frame for _, frame in result] == ["a", "b", END, {"role": "computer"}, "c"]
@@ -0,0 +1,52 @@
+import json
+
+from mindflow.llm.sse import SSEDecoder
+
+STREAM = (b": keep-alive\r\n"
+          b"event: message\r\n"
+          b"id: 1\r\n"
+          b'data: {"a": 1}\r\n'
+          b"\r\n"
+          b"data:first\n"
+          b"data: second\n"
+          b"retry: 100\n"
+          b"\n"
+          b"data: [DONE]")
+
+EVENTS = ['{"a": 1}', "first\nsecond", "[DONE]"]
+
+
+def decode(chunks: list[bytes]) -> list[str]:
+    decoder, events = SSEDecoder(), []
+    for chunk in chunks:
+        events += decoder.feed(chunk)
+    return events + decoder.close()
+
+
+def test_whole_stream():
+    assert decode([STREAM]) == EVENTS
+
+
+def test_byte_by_byte():
+    assert decode([STREAM[i:i + 1] for i in range(len(STREAM))]) == EVENTS
+
+
+def test_every_split():
+    for i in range(len(STREAM) + 1):
+        assert decode([STREAM[:i], STREAM[i:]]) == EVENTS
+
+
+def test_no_final_blank_line():
+    decoder = SSEDecoder()
+    assert decoder.feed(b'data: {"b": 2}\r\n') == []
+    assert decoder.close() == ['{"b": 2}']
+    assert decoder.close() == []
+
+
+def test_comments_and_fields_only():
+    assert decode([b": ping\n\nevent: ping\nid: 2\n\n"]) == []
+
+
+def test_multi_line_json():
+    events = decode([b'data: {"a":\ndata: [1, 2]}\n\n'])
+    assert [json.loads(event) for event in events] == [{"a": [1, 2]}]
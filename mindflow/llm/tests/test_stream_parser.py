@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from mindflow.llm import StreamParser, interpret_input
+
+CASES = [
+    "Run this: ```python\nprint(1)\n```\nok",
+    "Let's plot it.\n```python\nimport math\nprint(math.pi)\n```\nLet's run the code.",
+    "x ```python\ny```z\n",
+    "```py\nx``````js\ny```\nafter",
+    "```python\nunterminated\nblock",
+    "```py\n```\ntext",
+]
+
+
+def merged(blocks: list[dict]) -> list[dict]:
+    # `StreamParser` returns text a line at a time, `interpret_input` joins consecutive lines
+    result = []
+    for block in blocks:
+        if result and block["type"] == result[-1]["type"] == "message":
+            result[-1] = result[-1] | {"content": result[-1]["content"] + "\n" + block["content"]}
+        else:
+            result.append(block)
+    return result
+
+
+@pytest.mark.parametrize("text", CASES)
+def test_matches_interpret_input(text):
+    for seed in range(50):
+        rand, parser, blocks, i = random.Random(seed), StreamParser(), [], 0
+        while i < len(text):
+            step = rand.randint(1, 6)
+            blocks += parser.feed(text[i:i + step])
+            i += step
+        blocks += parser.close()
+        assert merged(blocks) == interpret_input(text)
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+import threading
+import time
+
+def normalise(query: str) -> str:
+    return " ".join(str(query).lower().split())
+
+class RecallCache:
+    """
+    LRU cache of recalled memories with a time-to-live.
+    Keys include the ltm generation, so any write makes older entries unreachable.
+    """
+    def __init__(self, size: int = 64, ttl: float = 300):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0}
+
+    def get(self, query: str, generation: int):
+        key = (normalise(query), generation)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self.entries.pop(key, None)
+                self.metrics["misses"] += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.metrics["hits"] += 1
+            return entry[1]
+
+    def put(self, query: str, generation: int, value):
+        key = (normalise(query), generation)
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -1,10 +1,129 @@
-from chromadb import HttpClient, AsyncHttpClient
+from chromadb import HttpClient, AsyncHttpClient, PersistentClient, EphemeralClient
+from chromadb.config import Settings
+from functools import partial
+from pathlib import Path
+import asyncio
+import os
+
+try:
+    import fcntl
+except ImportError: # windows
+    fcntl = None
 
 import logging
 logging.disable(logging.CRITICAL + 1)
 
 Memory: HttpClient = HttpClient
 AsyncMemory: AsyncHttpClient = AsyncHttpClient
+EmbeddedMemory: PersistentClient = PersistentClient
+
+# embedded stores this process holds, see `claim`
+claimed = {}
+
+def exported() -> bool:
+    # only a server is ever exported, an embedded store can't be shared between processes
+    return bool(os.getenv("MEMORY_PORT"))
+
+def resolve(host: str = None,
+            port: int = None) -> tuple:
+    # falls back to the server the running mindflow instance exported,
+    # so extensions running inside executed code reach the same store
+    if host is None and port is None:
+        host = os.getenv("MEMORY_HOST")
+        port = os.getenv("MEMORY_PORT")
+    return host or "localhost", int(port or 8000)
+
+def claim(path: Path | str):
+    # chroma doesn't support several processes on one persistent directory
+    if fcntl is None or str(path) in claimed:
+        return
+    lock = open(Path(path, "embedded.lock"), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        raise RuntimeError(f"The memory store `{path}` is already open in another process, "
+                           "use the memory server (`memory.embedded = False`) to share it.")
+    claimed[str(path)] = lock
+
+def connect(path: Path | str = None,
+            host: str = None,
+            port: int = None,
+            telemetry: bool = False,
+            ephemeral: bool = False):
+    settings = Settings(anonymized_telemetry=telemetry)
+    if path:
+        claim(path)
+        return EmbeddedMemory(str(path), settings=settings)
+    if ephemeral:
+        # private and in-memory, nothing shared
+        return EphemeralClient(settings=settings)
+    host, port = resolve(host, port)
+    return Memory(host=host, 
+                  port=port,
+                  settings=settings)
+
+async def connect_async(path: Path | str = None,
+                        host: str = None,
+                        port: int = None,
+                        telemetry: bool = False,
+                        ephemeral: bool = False):
+    if path or ephemeral:
+        return AsyncEmbeddedMemory(connect(path=path, telemetry=telemetry, ephemeral=ephemeral))
+    host, port = resolve(host, port)
+    return AsyncServerMemory(await AsyncMemory(host=host, 
+                                               port=port,
+                                               settings=Settings(anonymized_telemetry=telemetry)))
+
+class AsyncCollection:
+    # embedded stores have no async client,
+    # so their calls run on the default executor instead
+    def __init__(self, collection):
+        self.collection = collection
+        
+    async def run(self, method, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            None, partial(getattr(self.collection, method), **kwargs))
+    
+    async def query(self, **kwargs):
+        return await self.run("query", **kwargs)
+    
+    async def add(self, **kwargs):
+        return await self.run("add", **kwargs)
+
+class AsyncServerCollection:
+    # chroma's async client still embeds on the calling thread (and loads the model
+    # on first use), so embeddings are computed on the default executor instead
+    def __init__(self, collection):
+        self.collection = collection
+    
+    async def embed(self, texts: list[str], is_query: bool = False):
+        return await asyncio.get_running_loop().run_in_executor(
+            None, partial(self.collection._embed, input=texts, is_query=is_query))
+    
+    async def query(self, query_texts: list[str] = None, **kwargs):
+        if query_texts is not None:
+            kwargs["query_embeddings"] = await self.embed(query_texts, is_query=True)
+        return await self.collection.query(**kwargs)
+    
+    async def add(self, documents: list[str] = None, **kwargs):
+        if documents is not None and kwargs.get("embeddings") is None:
+            kwargs["embeddings"] = await self.embed(documents)
+        return await self.collection.add(documents=documents, **kwargs)
+
+class AsyncServerMemory:
+    def __init__(self, client):
+        self.client = client
+        
+    async def get_or_create_collection(self, name: str, **kwargs):
+        return AsyncServerCollection(await self.client.get_or_create_collection(name, **kwargs))
+
+class AsyncEmbeddedMemory:
+    def __init__(self, client):
+        self.client = client
+        
+    async def get_or_create_collection(self, name: str, **kwargs):
+        return AsyncCollection(self.client.get_or_create_collection(name, **kwargs))
 
 # can't believe HttpClient and AsyncHttpClient are functions, not classes
 # class Memory(HttpClient):
@@ -0,0 +1,62 @@
+import string
+
+ACKNOWLEDGEMENTS = {"ok", "okay", "k", "kk", "yes", "yep", "yeah", "no", "nope", "sure",
+                    "thanks", "thank you", "thx", "ty", "cool", "nice", "great", "alright",
+                    "got it", "continue", "go on", "go ahead", "hi", "hello", "hey"}
+
+class MemorisePolicy:
+    """
+    Decides when a conversation is worth memorising.
+    Several turns are batched into one summarising call, trivial turns are
+    skipped and only the last `window` messages are ever sent.
+    """
+    def __init__(self,
+                 turns: int = 3,
+                 window: int = 12,
+                 min_length: int = 4,
+                 acknowledgements: set = None):
+        self.turns = turns
+        self.window = window
+        self.min_length = min_length
+        self.acknowledgements = ACKNOWLEDGEMENTS if acknowledgements is None else acknowledgements
+
+        self.pending = []
+        self.metrics = {"turns": 0, "skipped": 0, "calls": 0, "saved": 0}
+
+    def trivial(self, turn: list[dict]) -> bool:
+        # only what the user says is worth remembering,
+        # pure computer output or "thanks" is not
+        said = [message.get("content", "") for message in turn
+                if message.get("role", "").lower() == "user"]
+        if not said:
+            return True
+
+        for content in said:
+            content = str(content).strip().lower().strip(string.punctuation + " ")
+            if len(content) >= self.min_length and content not in self.acknowledgements:
+                return False
+        return True
+
+    def submit(self, turn: list[dict]) -> list[dict] | None:
+        # returns the messages to memorise once enough turns are batched
+        self.metrics["turns"] += 1
+        if self.trivial(turn):
+            self.metrics["skipped"] += 1
+            self.metrics["saved"] += 1
+            return None
+
+        self.pending.append(turn)
+        if len(self.pending) < self.turns:
+            return None
+        return self.take()
+
+    def take(self) -> list[dict]:
+        messages = [message for turn in self.pending for message in turn][-self.window:]
+        self.metrics["calls"] += 1
+        self.metrics["saved"] += len(self.pending) - 1
+        self.pending = []
+        return messages
+
+    def flush(self) -> list[dict] | None:
+        if self.pending:
+            return self.take()
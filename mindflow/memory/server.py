@@ -2,34 +2,160 @@ import subprocess
 from pathlib import Path
 import chromadb
 from chromadb.config import Settings
+from urllib.request import urlopen
+from .client import connect, connect_async
+import socket
+import signal
+import json
+import time
+import os
 
 class Manager:
-    def __init__(self, 
+    def __init__(self,
                  path: Path | str = None,
                  port: int = None,
                  collections: list[str] = None,
-                 telemetry: bool = False):
-        self.port = port or 8000
+                 telemetry: bool = False,
+                 embedded: bool = False,
+                 timeout: float = 30):
+        self.port = port
         self.path = path
         self.collections = collections or ["ltm", "cache"]
         self.process = None
+        self.telemetry = telemetry
+        self.embedded = embedded
+        self.timeout = timeout
+
+        # daemon state, shared by every instance using this profile
+        self.state = Path(path, "memory.json")
+        self.logs = Path(path, "memory.log")
 
         if not Path(path).is_dir():
             client = chromadb.PersistentClient(str(path), Settings(anonymized_telemetry=telemetry))
             for collection in self.collections:
                 client.create_collection(name=collection)
-    
+
+    @staticmethod
+    def healthy(port: int, timeout: float = 0.5) -> bool:
+        # chroma moved its heartbeat to v2, older servers only have v1
+        for version in ("v2", "v1"):
+            try:
+                with urlopen(f"http://localhost:{port}/api/{version}/heartbeat", timeout=timeout) as response:
+                    if response.status == 200:
+                        return True
+            except Exception:
+                continue
+        return False
+
+    @staticmethod
+    def allocate() -> int:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("localhost", 0))
+            return sock.getsockname()[1]
+
+    def running(self) -> int | None:
+        # port of an already warm daemon for this profile, if any
+        if not self.state.is_file():
+            return None
+
+        try:
+            with open(self.state, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # the recorded port may have been reused by another server, only our own daemon counts
+        if self.owns(state.get("pid"), (port := state.get("port"))):
+            return port
+        self.state.unlink(missing_ok=True)
+
     def serve(self):
-        self.process = subprocess.Popen(
-            ["chroma", "run", "--path", str(self.path), "--port", str(self.port)], 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        # detached so the daemon outlives this cli invocation
+        kwargs = ({"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+                  if os.name == "nt" else {"start_new_session": True})
+
+        with open(self.logs, "w") as logs:
+            self.process = subprocess.Popen(
+                ["chroma", "run", "--path", str(self.path), "--port", str(self.port)],
+                stdout=logs,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+                **kwargs
+            )
 
     def serve_and_wait(self):
-        self.serve() 
-        for line in iter(self.process.stdout.readline, ''):
-            # print(line, end='')
-            if f"running on http://localhost:{self.port}" in line:
-                break
+        # a warm daemon already holds the store, embedded or not it's used
+        if (port := self.running()):
+            self.port, self.embedded = port, False
+            return
+
+        # embedded stores live in-process, nothing to spawn
+        if self.embedded:
+            return
+
+        if not self.port or self.healthy(self.port):
+            self.port = self.allocate()
+
+        self.serve()
+        deadline = time.monotonic() + self.timeout
+        while not self.healthy(self.port):
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Memory server exited with code {self.process.returncode}, see `{self.logs}`.")
+            if time.monotonic() > deadline:
+                self.process.kill()
+                raise TimeoutError(f"Memory server did not start within {self.timeout}s, see `{self.logs}`.")
+            time.sleep(0.1)
+
+        with open(self.state, "w") as f:
+            json.dump({"pid": self.process.pid, "port": self.port}, f)
+
+    def owns(self, pid: int, port: int) -> bool:
+        # pids are reused (e.g. after a reboot), only signal the daemon this profile started
+        if not (isinstance(pid, int) and port and self.healthy(port)):
+            return False
+        if not Path("/proc").is_dir():
+            # no procfs (macos, windows), the live server on the recorded port has to do
+            return True
+        try:
+            cmdline = Path("/proc", str(pid), "cmdline")
+            args = cmdline.read_bytes().decode(errors="replace").split("\0")
+        except OSError:
+            return False
+        return "run" in args and str(self.path) in args and str(port) in args
+
+    def stop(self):
+        if not self.state.is_file():
+            return
+
+        try:
+            with open(self.state, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+
+        if self.owns(state.get("pid"), state.get("port")):
+            try:
+                os.kill(state["pid"], signal.SIGTERM)
+            except OSError:
+                pass
+        self.state.unlink(missing_ok=True)
+
+    def export(self):
+        # lets extensions in executed code find the same server,
+        # an embedded store stays private to this process
+        if self.embedded:
+            os.environ.pop("MEMORY_PORT", None)
+        else:
+            os.environ["MEMORY_PORT"] = str(self.port)
+
+    def connect(self):
+        self.export()
+        if self.embedded:
+            return connect(path=self.path, telemetry=self.telemetry)
+        return connect(host="localhost", port=self.port, telemetry=self.telemetry)
+
+    async def connect_async(self):
+        self.export()
+        if self.embedded:
+            return await connect_async(path=self.path, telemetry=self.telemetry)
+        return await connect_async(host="localhost", port=self.port, telemetry=self.telemetry)
@@ -0,0 +1,123 @@
+from queue import Queue, Full, Empty
+import threading
+import asyncio
+import time
+
+class MemoryWorker:
+    """
+    Memorises conversations in the background.
+    Jobs are summarised one at a time and the resulting memories are
+    written to the collection in batches, so the chat loop never waits.
+    """
+    def __init__(self,
+                 memorise,
+                 write,
+                 size: int = 32,
+                 batch: int = 8,
+                 interval: float = 2.0,
+                 cleanup=None):
+
+        self.memorise = memorise # async, messages -> ltm.add kwargs or None
+        self.write = write # async, ltm.add
+        self.cleanup = cleanup # async, ran on the worker's loop before exiting
+        self.batch = batch
+        self.interval = interval
+
+        self.queue = Queue(maxsize=size)
+        self.pending = []
+        self.lock = threading.Lock()
+        self.metrics = {"queued": 0, "processed": 0, "failed": 0, "dropped": 0,
+                        "written": 0, "writes": 0, "depth": 0, "peak": 0, "lag": 0.0, "abandoned": 0}
+        self.closed = False
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def put(self, messages: list) -> bool:
+        if self.closed or not self.thread.is_alive():
+            return False
+
+        try:
+            self.queue.put_nowait((time.monotonic(), messages))
+        except Full:
+            # backpressure, drop rather than stall the chat loop
+            self.metrics["dropped"] += 1
+            return False
+
+        self.metrics["queued"] += 1
+        self.metrics["depth"] = self.queue.qsize()
+        self.metrics["peak"] = max(self.metrics["peak"], self.metrics["depth"])
+        return True
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        oldest = None
+        while True:
+            timeout = self.interval if oldest is None else max(0, oldest + self.interval - time.monotonic())
+            try:
+                job = self.queue.get(timeout=timeout)
+            except Empty:
+                loop.run_until_complete(self.flush_pending())
+                oldest = None
+                continue
+
+            if job is None:
+                self.queue.task_done()
+                break
+            
+            queued, messages = job
+            try:
+                memory = loop.run_until_complete(self.memorise(messages))
+            except Exception:
+                self.metrics["failed"] += 1
+            else:
+                self.metrics["processed"] += 1
+                if memory:
+                    with self.lock:
+                        self.pending.append(memory)
+                    oldest = oldest or time.monotonic()
+
+            self.metrics["lag"] = time.monotonic() - queued
+            self.metrics["depth"] = self.queue.qsize()
+            if len(self.pending) >= self.batch:
+                loop.run_until_complete(self.flush_pending())
+                oldest = None
+            self.queue.task_done()
+
+        loop.run_until_complete(self.flush_pending())
+        if self.cleanup:
+            loop.run_until_complete(self.cleanup())
+        loop.close()
+
+    async def flush_pending(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending:
+            return
+
+        kwargs = {"documents": [], "ids": [], "metadatas": []}
+        for memory in pending:
+            for key in kwargs:
+                kwargs[key] += memory[key]
+
+        try:
+            await self.write(**kwargs)
+        except Exception:
+            self.metrics["failed"] += len(pending)
+            return
+
+        self.metrics["writes"] += 1
+        self.metrics["written"] += len(kwargs["documents"])
+
+    def close(self, timeout: float = 10.0):
+        # waits for queued jobs at most `timeout` seconds, the rest die with the daemon thread
+        if self.closed or not self.thread.is_alive():
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            # jobs still queued or in flight, not counting the stop sentinel (done once it is reached)
+            self.metrics["abandoned"] = max(0, self.queue.unfinished_tasks - 1)
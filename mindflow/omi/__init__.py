@@ -1,6 +1,6 @@
 import argparse
 from ..computer import Computer
-from ..utils import ROOT_DIR
+from ..utils import ROOT_DIR, profile_dir
 from pathlib import Path
 import subprocess
 from rich_argparse import RichHelpFormatter
@@ -27,7 +27,8 @@ def main():
     remove_parser.add_argument('module_name', metavar='<module_name>', type=str, help='Module name to remove')
 
     args = parser.parse_args()
-    pip = [Computer().supported["python"][0], "-m", "pip", "install"]
+    cache = Path(path, "toolchain.json") if (path := profile_dir()) and path.is_dir() else None
+    pip = [Computer(cache=cache).supported["python"][0], "-m", "pip", "install"]
     
     if args.command == 'install':
         subprocess.run(pip + [args.module_name])
@@ -15,20 +15,43 @@ class Safeguards(TypedDict):
     timeout: int
     auto_run: bool
     auto_install: bool
+    output_limit: int
+    limits: Dict
 
 class Paths(TypedDict):
     prompts: str
     memories: str
 
+class Memory(TypedDict):
+    embedded: bool
+    port: int
+    timeout: int
+    queue: int
+    batch: int
+    close_timeout: float
+    turns: int
+    window: int
+    recall_cache: int
+    recall_ttl: int
+    recall_deadline: float
+
 class Config(TypedDict):
     telemetry: bool
     ephemeral: bool
     verbose: bool
+    kernels: bool
+    parallel: int
+    metrics: str | None
+    cassette: dict | None
+    context: dict
+    frames: dict
+    render: str
 
 class Profile(TypedDict):
     user: User
     assistant: Assistant
     safeguards: Safeguards
     paths: Paths
+    memory: Memory
     extensions: Dict
     config: Config
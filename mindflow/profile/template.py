@@ -1,6 +1,5 @@
 from mindflow.profile import Profile
-from mindflow.utils import USERNAME, ROOT_DIR
-from mindflow.extensions import BrowserKwargs
+from mindflow.utils import USERNAME, ROOT_DIR, Kwargs
 from pathlib import Path
 
 profile: Profile = Profile(
@@ -18,11 +17,31 @@ profile: Profile = Profile(
     safeguards = { 
         "timeout": 16, 
         "auto_run": True, 
-        "auto_install": True 
+        "auto_install": True,
+        "output_limit": 8000,
+        # per run, override per language e.g. "python": {"memory": 4096}
+        "limits": {
+            "time": 120, # seconds
+            "cpu": None, # seconds, bash runs without its persistent shell when set
+            "memory": None # MB
+        }
     },
     paths = { 
         "prompts": Path(ROOT_DIR, "core", "prompts"),
     },
+    memory = {
+        "embedded": False,
+        "port": None,
+        "timeout": 30,
+        "queue": 32,
+        "batch": 8,
+        "close_timeout": 10, # seconds to wait for queued memories on exit
+        "turns": 3,
+        "window": 12,
+        "recall_cache": 64,
+        "recall_ttl": 300,
+        "recall_deadline": None
+    },
     config = {
         "telemetry": False,
         "ephemeral": False,
@@ -30,9 +49,28 @@ profile: Profile = Profile(
         "local": False,
         "dev": False,
         "conversational": True,
+        "kernels": True,
+        "parallel": 4,
+        "metrics": None,
+        # e.g. {"path": "cassettes", "mode": "once", "speed": 1.0}
+        "cassette": None,
+        # prompt budget (tokens), older turns are folded into a rolling summary
+        "context": {
+            "window": 8192,
+            "keep": 6,
+            "compact": 0.75,
+            "summary": 400
+        },
+        # llm deltas are merged into frames of up to `size` characters or `interval` seconds
+        "frames": {
+            "size": 256,
+            "interval": 0.02
+        },
+        # cli output, "live" renders markdown as it streams, "raw" prints plain text (always used for pipes)
+        "render": "live",
     },
     extensions = {
-        "Browser": BrowserKwargs(engine="google")
+        "Browser": Kwargs(engine="google")
     },
     tts = {
         "enabled": True,
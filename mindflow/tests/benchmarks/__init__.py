@@ -0,0 +1,5 @@
+"""
+End-to-end benchmarks, `MindFlow.chat` against a local mock of the SambaNova api.
+
+    python -m mindflow.tests.benchmarks --turns 50 --rate 120 --json results.json
+"""
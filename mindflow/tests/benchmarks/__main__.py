@@ -0,0 +1,51 @@
+from .session import run
+
+from rich import print
+from rich.table import Table
+import argparse
+import json
+
+def table(report: dict) -> Table:
+    table = Table(title=f"Benchmark ({report['config']['turns']} turns)", title_justify="left")
+    table.add_column("metric")
+    for column in ("mean", "p50", "p90", "max"):
+        table.add_column(column, justify="right")
+
+    rows = (("turn (s)", "turn"), ("ttft, turn (s)", "ttft"), ("ttft, llm (s)", "llm_ttft"),
+            ("tokens/s", "tokens_per_second"), ("recall (s)", "recall"),
+            ("overhead per turn (s)", "overhead"), ("memorise (s)", "memorise"))
+    for title, key in rows:
+        if (stats := report[key]):
+            table.add_row(title, *(f"{stats[column]:.3f}" for column in ("mean", "p50", "p90", "max")))
+    return table
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark `MindFlow.chat` against a local mock SambaNova server.")
+    parser.add_argument("--turns", type=int, default=20, help="Chat turns in the session.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token.")
+    parser.add_argument("--rate", type=float, default=80, help="Tokens per second once streaming.")
+    parser.add_argument("--chunk", type=int, default=1, help="Tokens per SSE event.")
+    parser.add_argument("--tokens", type=int, default=120, help="Tokens per reply.")
+    parser.add_argument("--code", type=int, default=0, help="Run a notebook every n-th turn (0 never).")
+    parser.add_argument("--embedded", action="store_true", help="In-process chroma instead of the memory server.")
+    parser.add_argument("--json", metavar="<path>", help="Save the full report as JSON.")
+    args = parser.parse_args()
+
+    report = run(turns=args.turns, latency=args.latency, rate=args.rate, chunk=args.chunk,
+                 tokens=args.tokens, code=args.code, embedded=args.embedded)
+
+    print(table(report))
+    memory = report["memory"]
+    print(f"start-up {report['startup']:.2f}s · {report['requests']} llm requests · "
+          f"rss {memory['start'] / 2**20:.0f}MB -> {memory['end'] / 2**20:.0f}MB "
+          f"({memory['growth_per_turn'] / 2**10:.1f}KB per turn)")
+    for name, counters in report["counters"].items():
+        print(f"{name}: " + ", ".join(f"{key} {value:.3f}" if isinstance(value, float) else f"{key} {value}"
+                                      for key, value in counters.items()))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+from aiohttp import web
+import threading
+import asyncio
+import socket
+import random
+import json
+import re
+
+WORDS = ("the", "model", "answers", "with", "a", "short", "and", "clear", "reply", "about",
+         "your", "question", "using", "plain", "words", "so", "it", "is", "easy", "to", "read")
+
+CODE = "Here is the code.\n```python\nprint(sum(range(1000)))\n```\nLet's run the code.\n"
+
+class MockSambaNova:
+    """
+    Local stand-in for the SambaNova `/v1/chat/completions` SSE stream.
+    Served from its own thread, so it never competes with mindflow's loops.
+
+    latency: seconds before the first chunk
+    rate: tokens per second once streaming
+    chunk: tokens per SSE event
+    tokens: length of a reply
+    code: every n-th user turn asks to run a notebook (0 never)
+    """
+    def __init__(self,
+                 latency: float = 0.2,
+                 rate: float = 80,
+                 chunk: int = 1,
+                 tokens: int = 120,
+                 code: int = 0,
+                 seed: int = 0):
+        self.latency = latency
+        self.rate = rate
+        self.chunk = chunk
+        self.tokens = tokens
+        self.code = code
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.turns = 0
+        self.loop = None
+        self.runner = None
+        self.port = None
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1/chat/completions"
+
+    def start(self) -> "MockSambaNova":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        self.port = sock.getsockname()[1]
+
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        threading.Thread(target=self.serve, args=(sock, ready), daemon=True, name="mock-sambanova").start()
+        ready.wait()
+        return self
+
+    def serve(self, sock: socket.socket, ready: threading.Event):
+        asyncio.set_event_loop(self.loop)
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.completions)
+        app.router.add_get("/v1/models", self.models)
+
+        self.runner = web.AppRunner(app)
+        self.loop.run_until_complete(self.runner.setup())
+        self.loop.run_until_complete(web.SockSite(self.runner, sock).start())
+        ready.set()
+        self.loop.run_forever()
+
+    def stop(self):
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def respond(self, messages: list[dict]) -> str:
+        system, last = messages[0]["content"], messages[-1]
+        if "long-term memory" in system:
+            return json.dumps({"memory": f"User asked benchmark question {self.turns}",
+                               "metadata": {"turn": self.turns}})
+
+        if last["role"] == "user":
+            self.turns += 1
+            if self.code and self.turns % self.code == 0:
+                return CODE
+
+        words = [self.random.choice(WORDS) for _ in range(self.tokens - 4)]
+        return " ".join(words).capitalize() + ". The task is done."
+
+    @staticmethod
+    def event(data: dict) -> bytes:
+        return b"data: " + json.dumps(data).encode() + b"\n\n"
+
+    async def completions(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        data = await request.json()
+        tokens = re.findall(r"\S+\s*|\s+", self.respond(data["messages"]))
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await asyncio.sleep(self.latency)
+
+        for i in range(0, len(tokens), self.chunk):
+            content = "".join(tokens[i:i + self.chunk])
+            await response.write(self.event({"choices": [{"delta": {"content": content}, "finish_reason": None}]}))
+            await asyncio.sleep(self.chunk / self.rate)
+
+        await response.write(self.event({"choices": [{"delta": {}, "finish_reason": "stop"}],
+                                         "usage": {"completion_tokens": len(tokens)}}))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def models(self, request: web.Request) -> web.Response:
+        return web.json_response({"data": [{"id": "Meta-Llama-3.1-405B-Instruct"}]})
@@ -0,0 +1,144 @@
+from ...core import MindFlow
+from ...profile.template import profile as default_profile
+from ...utils.metrics import metrics
+from .mock import MockSambaNova
+
+from copy import deepcopy
+from pathlib import Path
+import threading
+import tempfile
+import shutil
+import time
+import os
+
+try:
+    import resource
+except ImportError: # windows
+    resource = None
+
+class Recorder:
+    # metrics sink, groups the spans finished on the chat's thread (and the
+    # notebooks it waits for) into turns, background work is kept aside
+    def __init__(self, thread: int):
+        self.thread = thread
+        self.spans = []
+        self.turns = []
+        self.background = []
+        self.lock = threading.Lock()
+
+    def record(self, span):
+        with self.lock:
+            if threading.get_ident() != self.thread and span.name != "execute":
+                self.background.append(span)
+                return
+            if span.name != "turn":
+                self.spans.append(span)
+                return
+            self.turns.append((span, self.spans))
+            self.spans = []
+
+    def close(self):
+        pass
+
+def rss() -> int:
+    # resident memory in bytes, peak if the current value isn't available
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        scale = 1 if os.uname().sysname == "Darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+def stats(values: list) -> dict:
+    values = sorted(values)
+    if not values:
+        return {}
+    return {"mean": sum(values) / len(values),
+            "p50": values[len(values) // 2],
+            "p90": values[min(len(values) - 1, int(len(values) * 0.9))],
+            "max": values[-1]}
+
+def profile(directory: Path, embedded: bool) -> dict:
+    profile = deepcopy(default_profile)
+    profile["user"] = {"name": "benchmark", "version": "1.0.0"}
+    profile["config"] |= {"verbose": False, "dev": False, "metrics": None}
+    profile["memory"] = profile.get("memory", {}) | {"embedded": embedded}
+    profile["paths"] = {"prompts": str(default_profile["paths"]["prompts"]),
+                        "memories": Path(directory, "benchmark", "1.0.0")}
+    profile["tts"] = {"enabled": False}
+    return profile
+
+def run(turns: int = 20,
+        latency: float = 0.2,
+        rate: float = 80,
+        chunk: int = 1,
+        tokens: int = 120,
+        code: int = 0,
+        embedded: bool = False,
+        sample: int = 10) -> dict:
+    """
+    Runs `turns` chat turns against the mock server and a throwaway profile.
+    Nothing is read from, or written to, the user's own profiles.
+    """
+    mock = MockSambaNova(latency=latency, rate=rate, chunk=chunk, tokens=tokens, code=code).start()
+    directory = Path(tempfile.mkdtemp(prefix="mindflow-benchmark-"))
+    config = profile(directory, embedded)
+    config["paths"]["memories"].mkdir(parents=True)
+
+    # an initialised profile, so `init_profile` leaves the user's `.env` alone
+    environ = dict(os.environ)
+    os.environ |= {"API_KEY": "benchmark",
+                   "API_ENDPOINT": mock.endpoint,
+                   "PROFILE": "benchmark:1.0.0"}
+
+    recorder = Recorder(threading.get_ident())
+    metrics.sinks.append(recorder)
+    macro = None
+    try:
+        start = time.perf_counter()
+        macro = MindFlow(config)
+        startup = time.perf_counter() - start
+
+        memory, samples = rss(), []
+        for turn in range(turns):
+            macro.chat(f"benchmark question {turn}, please answer briefly.")
+            if turn % sample == 0 or turn == turns - 1:
+                samples.append({"turn": turn + 1, "rss": rss(), "messages": len(macro.llm.messages)})
+
+        macro.loop.run_until_complete(macro.close())
+    finally:
+        metrics.sinks.remove(recorder)
+        if macro is not None and not embedded:
+            macro.memory_manager.stop()
+        mock.stop()
+        os.environ.clear()
+        os.environ.update(environ)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    # time spent in mindflow itself, on top of the llm stream and the notebooks
+    overhead = [turn.seconds - sum(span.seconds for span in spans if span.name in ("llm", "execute"))
+                for turn, spans in recorder.turns]
+    named = lambda name: [span for _, spans in recorder.turns for span in spans if span.name == name]
+    return {
+        "config": {"turns": turns, "latency": latency, "rate": rate, "chunk": chunk,
+                   "tokens": tokens, "code": code, "embedded": embedded},
+        "startup": startup,
+        "turn": stats([turn.seconds for turn, _ in recorder.turns]),
+        "ttft": stats([turn.attributes["ttft"] for turn, _ in recorder.turns if "ttft" in turn.attributes]),
+        "llm_ttft": stats([span.attributes["ttft"] for span in named("llm") if "ttft" in span.attributes]),
+        "tokens_per_second": stats([span.attributes["tokens_per_second"] for span in named("llm")
+                                    if "tokens_per_second" in span.attributes]),
+        "recall": stats([span.seconds for span in named("recall")]),
+        "overhead": stats(overhead),
+        "memorise": stats([span.seconds for span in recorder.background if span.name == "memorise"]),
+        "memory": {"start": memory,
+                   "end": samples[-1]["rss"] if samples else memory,
+                   "growth_per_turn": (samples[-1]["rss"] - memory) / turns if samples else 0,
+                   "samples": samples},
+        "requests": mock.requests,
+        "counters": {"policy": dict(macro.memorise_policy.metrics),
+                     "recall_cache": dict(macro.recall_cache.metrics),
+                     "memoriser": dict(macro.memoriser.metrics)},
+    }
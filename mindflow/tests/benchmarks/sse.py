@@ -0,0 +1,96 @@
+"""
+Per-event cost of decoding a SambaNova stream.
+
+    python -m mindflow.tests.benchmarks.sse --events 20000
+"""
+from ...llm import sse
+from ...llm.sse import SSEDecoder
+
+from rich import print
+from rich.table import Table
+import argparse
+import random
+import json
+import time
+
+def event(index: int) -> bytes:
+    # shaped like a SambaNova delta
+    data = {"id": "chatcmpl-0a1b2c3d", "object": "chat.completion.chunk", "created": 1729000000,
+            "model": "Meta-Llama-3.1-405B-Instruct", "system_fingerprint": "fastcoe",
+            "choices": [{"index": 0, "delta": {"content": f" token{index}"}, "logprobs": None, "finish_reason": None}]}
+    return b"data: " + json.dumps(data).encode() + b"\n\n"
+
+def stream(events: int, size: int, seed: int = 0) -> list[bytes]:
+    # the whole response, cut into network reads of up to `size` bytes
+    payload = b"".join(map(event, range(events))) + b"data: [DONE]\n\n"
+    rand, chunks, i = random.Random(seed), [], 0
+    while i < len(payload):
+        step = rand.randint(1, size)
+        chunks.append(payload[i:i + step])
+        i += step
+    return chunks
+
+def lines(chunks: list[bytes]):
+    # what aiohttp's `readline` did for the previous decoder (minus an await per line)
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        yield from complete
+
+def legacy(chunks: list[bytes]) -> int:
+    # the previous decoder, a fixed `data: ` prefix and one json parse per line
+    count = 0
+    for line in lines(chunks):
+        if line:
+            decoded = line.decode("utf-8")[6:]
+            if not decoded or decoded.strip() == "[DONE]":
+                continue
+            json.loads(decoded)
+            count += 1
+    return count
+
+def incremental(chunks: list[bytes]) -> int:
+    decoder, count = SSEDecoder(), 0
+    for chunk in chunks:
+        for data in decoder.feed(chunk):
+            if sse.loads(data) is not None:
+                count += 1
+    return count
+
+def measure(decode, chunks: list[bytes], repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = decode(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark of the SSE decoder.")
+    parser.add_argument("--events", type=int, default=20000, help="Events in the stream.")
+    parser.add_argument("--size", type=int, default=1400, help="Largest network read, in bytes.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per decoder, the best one counts.")
+    args = parser.parse_args()
+
+    chunks = stream(args.events, args.size)
+    table = Table(title=f"SSE decoding ({args.events} events, reads up to {args.size}B)", title_justify="left")
+    for column in ("decoder", "µs / event", "µs / read", "events / s"):
+        table.add_column(column, justify="left" if column == "decoder" else "right")
+
+    backend = sse.orjson
+    decoders = [("legacy, json", legacy, None), ("incremental, json", incremental, None)]
+    if backend:
+        decoders.append(("incremental, orjson", incremental, backend))
+
+    for name, decode, json_backend in decoders:
+        sse.orjson = json_backend
+        seconds, count = measure(decode, chunks, args.repeat)
+        table.add_row(name, f"{seconds / count * 1e6:.2f}", f"{seconds / len(chunks) * 1e6:.2f}",
+                      f"{count / seconds:,.0f}")
+    sse.orjson = backend
+
+    print(table)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+from ...core import MindFlow
+from rich import print
+import asyncio
+import os
+
+# live services, needs API_KEY in the environment or `.env`
+macro = MindFlow()
+
+def browser():
+    query = input("search: ")
+    summary = macro.extensions.browser.search(query, n=1)
+    print(summary)
+    
+    # input("Press enter to continue...")
+    # results = get_relevant(macro.collection.query(query_texts=[query], n_results=3))
+    # for document in results['documents'][0]:
+    #     print(Markdown(document))
+    #     print("\n<END SECTION>\n")
+    
+def perplexity():
+    query = input("search: ")
+    summary = macro.extensions.browser.perplexity_search(query)
+    print(summary)
+    
+    # input("Press enter to continue...")
+    # results = get_relevant(macro.collection.query(query_texts=[query], n_results=3))
+    # for document in results['documents'][0]:
+    #     print(Markdown(document))
+    #     print("\n<END SECTION>\n")
+    
+perplexity()
+#browser()
@@ -28,15 +28,24 @@ def env_safe_replace(path: Path | str,
     
     with open(path, "r") as f:
         env = toml.load(f)
-        
-    with open(path, "w") as f:
-        f.write(toml.dumps(
-            env | variables
-        ))
+    
+    # nothing to write, `.env`s are rewritten on every switch otherwise
+    if env | variables != env:
+        with open(path, "w") as f:
+            f.write(toml.dumps(
+                env | variables
+            ))
         
     for key, value in variables.items():
         os.environ[key] = value
     
+def profile_dir() -> Path | None:
+    # directory of the last initialised profile
+    if not (profile := os.getenv("PROFILE")):
+        return None
+    name, version = profile.split(":")
+    return Path(ROOT_DIR, "profiles", name, version)
+    
 def is_installed(package):
     spec = importlib.util.find_spec(package)
     return spec is not None
@@ -76,14 +85,14 @@ def init_profile(profile: dict,
         profile["paths"][key] = str(path)
         
     path = Path(memories_dir, "profile.json")
-    path.touch()
-    
     json = lazy_import("json")
-    with open(path, "w") as f: 
-        f.write(json.dumps(profile)) 
+    if not path.is_file() or path.read_text() != json.dumps(profile):
+        with open(path, "w") as f: 
+            f.write(json.dumps(profile)) 
         
     env = Path(memories_dir.parent, ".env")
-    env.touch()
+    if not env.is_file():
+        env.touch()
     
     api_key = profile["env"].get("api_key") or os.getenv("API_KEY")
     if not api_key:
@@ -128,6 +137,14 @@ def load_profile(profile_path: Path | str,
         
     return {}
 
+def load_env(*paths: Path | str) -> dict:
+    # same precedence as consecutive `load_dotenv` calls, the first file wins
+    from dotenv import dotenv_values
+    env = {}
+    for path in reversed(paths):
+        env |= {key: value for key, value in dotenv_values(path).items() if value is not None}
+    return env
+
 def re_format(text, replacements, pattern=r'\{([a-zA-Z0-9_]+)\}', strict=False):
     matches = set(re.findall(pattern, text))
     if strict and (missing := matches - set(replacements.keys())):
@@ -0,0 +1,125 @@
+from pathlib import Path
+import hashlib
+import asyncio
+import json
+import gzip
+import time
+import os
+import re
+
+# picked up by anything constructed without an explicit cassette,
+# including the browser running inside a kernel
+ENV = "MINDFLOW_CASSETTE"
+MODE_ENV = "MINDFLOW_CASSETTE_MODE"
+SPEED_ENV = "MINDFLOW_CASSETTE_SPEED"
+
+MODES = ("record", "replay", "once")
+
+# timestamps mindflow puts in prompts, they would never match a recording
+VOLATILE = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}|\d{2}:\d{2} [AP]M \d{2}/\d{2}/\d{4}")
+
+class CassetteMissing(KeyError):
+    pass
+
+class Cassette:
+    """
+    Records llm streams and browser calls to disk and replays them offline.
+    One gzipped JSON file per request, named by a fingerprint of the request.
+
+    mode: "record" always calls through and overwrites,
+          "replay" never calls through (missing recordings raise `CassetteMissing`),
+          "once" replays what exists and records the rest
+    speed: replay timing, 1 as recorded, 10 ten times faster, 0 without delays
+    """
+    def __init__(self, path: Path | str, mode: str = "once", speed: float = 1.0):
+        if mode not in MODES:
+            raise ValueError(f"Cassette mode must be one of {MODES}, not `{mode}`")
+        self.path = Path(path)
+        self.mode = mode
+        self.speed = speed
+
+    @classmethod
+    def from_env(cls) -> "Cassette | None":
+        if not (path := os.getenv(ENV)):
+            return None
+        return cls(path, mode=os.getenv(MODE_ENV, "once"), speed=float(os.getenv(SPEED_ENV, 1.0)))
+
+    def export(self):
+        os.environ |= {ENV: str(self.path), MODE_ENV: self.mode, SPEED_ENV: str(self.speed)}
+
+    @property
+    def offline(self) -> bool:
+        return self.mode == "replay"
+
+    @staticmethod
+    def fingerprint(kind: str, request) -> str:
+        request = VOLATILE.sub("<time>", json.dumps(request, sort_keys=True, default=str))
+        return hashlib.sha1(f"{kind}:{request}".encode()).hexdigest()
+
+    def file(self, kind: str, key: str) -> Path:
+        return Path(self.path, kind, key + ".json.gz")
+
+    def load(self, kind: str, key: str) -> dict | None:
+        if self.mode == "record" or not (file := self.file(kind, key)).is_file():
+            return None
+        with gzip.open(file, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, kind: str, key: str, entry: dict):
+        file = self.file(kind, key)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(file, "wt", encoding="utf-8") as f:
+            json.dump(entry, f)
+
+    def missing(self, kind: str, key: str):
+        if self.offline:
+            raise CassetteMissing(f"No recording of this {kind} request ({key[:12]}) in `{self.path}`")
+
+    async def wait(self, seconds: float):
+        if self.speed > 0 and seconds > 0:
+            await asyncio.sleep(seconds / self.speed)
+
+    @staticmethod
+    def encode(item):
+        # bytes (raw sse lines) survive the round trip through json
+        if isinstance(item, bytes):
+            return {"bytes": item.decode("utf-8", "surrogateescape")}
+        return item
+
+    @staticmethod
+    def decode(item):
+        if isinstance(item, dict) and item.keys() == {"bytes"}:
+            return item["bytes"].encode("utf-8", "surrogateescape")
+        return item
+
+    async def stream(self, kind: str, request, source):
+        # `source()` returns the live async iterator, only called when recording
+        key = self.fingerprint(kind, request)
+        if (entry := self.load(kind, key)) is not None:
+            previous = 0
+            for offset, item in entry["events"]:
+                await self.wait(offset - previous)
+                previous = offset
+                yield self.decode(item)
+            return
+
+        self.missing(kind, key)
+        events, start = [], time.perf_counter()
+        async for item in source():
+            events.append([time.perf_counter() - start, self.encode(item)])
+            yield item
+        self.save(kind, key, {"kind": kind, "request": request, "events": events})
+
+    async def call(self, kind: str, request, source):
+        # `source()` returns the live awaitable, only called when recording
+        key = self.fingerprint(kind, request)
+        if (entry := self.load(kind, key)) is not None:
+            await self.wait(entry["seconds"])
+            return self.decode(entry["result"])
+
+        self.missing(kind, key)
+        start = time.perf_counter()
+        result = await source()
+        self.save(kind, key, {"kind": kind, "request": request,
+                              "seconds": time.perf_counter() - start, "result": self.encode(result)})
+        return result
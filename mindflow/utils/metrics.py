@@ -0,0 +1,214 @@
+from collections import defaultdict, deque
+from pathlib import Path
+import threading
+import json
+import time
+import os
+
+# picked up by processes started from mindflow (e.g. kernels running the browser)
+ENV = "MINDFLOW_METRICS"
+
+class Span:
+    """
+    A timed stage of a turn (recall, llm, execution, ...).
+    Attributes describe it, marks are offsets of events since it started.
+    """
+    __slots__ = ("metrics", "name", "attributes", "start", "seconds")
+
+    def __init__(self, metrics: "Metrics", name: str, attributes: dict):
+        self.metrics = metrics
+        self.name = name
+        self.attributes = attributes
+        self.start = self.seconds = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, kind, value, trace):
+        self.seconds = self.elapsed()
+        if kind is not None:
+            self.attributes["error"] = kind.__name__
+        self.metrics.emit(self)
+
+    def __bool__(self):
+        return True
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def mark(self, event: str):
+        # only the first occurrence counts, e.g. the first token
+        self.attributes.setdefault(event, self.elapsed())
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "seconds": self.seconds, "time": time.time()} | self.attributes
+
+class NullSpan:
+    # handed out while metrics are disabled, falsy so callers can skip extra work
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, trace):
+        pass
+
+    def __bool__(self):
+        return False
+
+    def elapsed(self) -> float:
+        return 0.0
+
+    def set(self, **attributes):
+        pass
+
+    def mark(self, event: str):
+        pass
+
+NULL = NullSpan()
+
+class JsonLines:
+    # one span per line, appended
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.file = None
+
+    def record(self, span: Span):
+        line = json.dumps(span.to_dict() | {"pid": os.getpid()}, default=str) + "\n"
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a", buffering=1)
+            self.file.write(line)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+class Histogram:
+    """
+    Recent durations per span, plus every numeric attribute (e.g. `llm.ttft`).
+    Bounded, so long sessions don't grow it.
+    """
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self.series = defaultdict(lambda: deque(maxlen=self.size))
+        self.lock = threading.Lock()
+
+    def record(self, span: Span):
+        with self.lock:
+            self.series[span.name].append(span.seconds)
+            for key, value in span.attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self.series[f"{span.name}.{key}"].append(value)
+
+    @staticmethod
+    def percentile(values: list, q: float) -> float:
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def summary(self) -> dict:
+        with self.lock:
+            series = {name: sorted(values) for name, values in self.series.items()}
+        return {name: {"count": len(values),
+                       "mean": sum(values) / len(values),
+                       "p50": self.percentile(values, 0.5),
+                       "p90": self.percentile(values, 0.9),
+                       "p99": self.percentile(values, 0.99),
+                       "max": values[-1]}
+                for name, values in series.items() if values}
+
+    def close(self):
+        pass
+
+class Printer:
+    # `--verbose`, one line per turn with the spans that finished during it
+    def __init__(self):
+        self.spans = []
+        self.histogram = Histogram()
+        self.lock = threading.Lock()
+
+    def record(self, span: Span):
+        self.histogram.record(span)
+        with self.lock:
+            if span.name != "turn":
+                self.spans.append(span)
+                return
+            spans, self.spans = self.spans, []
+
+        from rich import print
+        print("[dim]" + " · ".join(map(self.describe, spans + [span])) + "[/dim]")
+
+    @staticmethod
+    def value(key: str, value) -> str:
+        # floats are marks (seconds) unless they are rates
+        if not isinstance(value, float):
+            return f"{key} {value}"
+        if key.endswith("_per_second"):
+            return f"{key} {value:.1f}"
+        return f"{key} {value * 1000:.0f}ms"
+
+    def describe(self, span: Span) -> str:
+        details = ", ".join(self.value(key, value) for key, value in span.attributes.items())
+        return f"{span.name} {span.seconds * 1000:.0f}ms" + (f" ({details})" if details else "")
+
+    def close(self):
+        from rich import print
+        # spans after the last turn, e.g. the memoriser's counters on exit
+        with self.lock:
+            spans, self.spans = self.spans, []
+        if spans:
+            print("[dim]" + " · ".join(map(self.describe, spans)) + "[/dim]")
+
+        if not (summary := self.histogram.summary()):
+            return
+
+        from rich.table import Table
+        table = Table(title="Latency", title_justify="left")
+        for column in ("span", "count", "p50", "p90", "p99", "max"):
+            table.add_column(column, justify="left" if column == "span" else "right")
+        for name, stats in sorted(summary.items()):
+            table.add_row(name, str(stats["count"]), *(f"{stats[key]:.3f}" for key in ("p50", "p90", "p99", "max")))
+        print(table)
+
+class Metrics:
+    """
+    Spans are sent to every sink once they finish.
+    With no sinks, `span()` returns a shared no-op span.
+    """
+    def __init__(self, sinks: list = None):
+        self.sinks = list(sinks or [])
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks)
+
+    def span(self, name: str, **attributes) -> Span | NullSpan:
+        if not self.sinks:
+            return NULL
+        return Span(self, name, attributes)
+
+    def emit(self, span: Span):
+        for sink in self.sinks:
+            try:
+                sink.record(span)
+            except Exception:
+                pass
+
+    def configure(self, path: Path | str = None, verbose: bool = False):
+        if path and not any(isinstance(sink, JsonLines) for sink in self.sinks):
+            self.sinks.append(JsonLines(path))
+            os.environ[ENV] = str(path)
+        if verbose and not any(isinstance(sink, Printer) for sink in self.sinks):
+            self.sinks.append(Printer())
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+metrics = Metrics([JsonLines(os.environ[ENV])] if os.getenv(ENV) else [])
@@ -0,0 +1,65 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+
+class Snapshot:
+    """
+    Compiled start-up state of a profile (its rendered prompts).
+    Each section is stored with a digest of its sources and only rebuilt,
+    and written back, when one of them changes.
+    Only derived, non-secret data belongs here, the file is plain JSON.
+    """
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.sections = self.load()
+        self.dirty = False
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def digest(*sources) -> str:
+        # files and directories by stat, anything else by value
+        digest = hashlib.sha1()
+        for source in sources:
+            if isinstance(source, Path):
+                paths = sorted(source.iterdir()) if source.is_dir() else [source]
+                for path in paths:
+                    try: stat = os.stat(path)
+                    except OSError: stat = None
+                    digest.update(repr((str(path), stat and (stat.st_size, stat.st_mtime_ns))).encode())
+            else:
+                digest.update(json.dumps(source, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def get(self, name: str, digest: str):
+        section = self.sections.get(name, {})
+        if section.get("digest") != digest:
+            return None
+        return section["value"]
+
+    def put(self, name: str, digest: str, value):
+        self.sections[name] = {"digest": digest, "value": value}
+        self.dirty = True
+        return value
+
+    def compile(self, name: str, sources: tuple, build):
+        digest = self.digest(*sources)
+        if (value := self.get(name, digest)) is None:
+            value = self.put(name, digest, build())
+        return value
+
+    def save(self):
+        if not self.dirty or not self.path.parent.is_dir():
+            return
+        try:
+            with open(self.path, "w") as f:
+                json.dump(self.sections, f)
+            self.dirty = False
+        except OSError:
+            pass
@@ -0,0 +1,56 @@
+from contextlib import contextmanager
+import platform
+import time
+import sys
+
+class Startup:
+    """
+    Times the phases of start-up, reported by `macro --profile-startup`.
+    Phases are recorded in the order they finish, nested phases are not supported.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def report(self) -> dict:
+        total = self.total()
+        return {
+            "total": round(total, 6),
+            "untracked": round(total - sum(seconds for _, seconds in self.phases), 6),
+            "phases": [{"name": name, "seconds": round(seconds, 6)}
+                       for name, seconds in self.phases],
+            "python": platform.python_version(),
+            "platform": sys.platform,
+        }
+
+    def table(self):
+        from rich.table import Table
+
+        report = self.report()
+        table = Table(title="Start-up", title_justify="left")
+        table.add_column("phase")
+        table.add_column("ms", justify="right")
+        table.add_column("%", justify="right")
+
+        for phase in report["phases"] + [{"name": "[dim]untracked[/dim]", "seconds": report["untracked"]}]:
+            table.add_row(phase["name"],
+                          f"{phase['seconds'] * 1000:.1f}",
+                          f"{phase['seconds'] / report['total'] * 100:.1f}")
+        table.add_row("[bold]total[/bold]", f"[bold]{report['total'] * 1000:.1f}[/bold]", "100.0")
+        return table